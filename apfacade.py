@@ -1,16 +1,29 @@
-import micronap.sdk as ap
+from collections import deque
 
 import settings
+from stats import Observer
+import utils
+
+ap = utils.LazyModule('micronap.sdk')
+
+
+def query_device_names():
+    """Returns the name of every AP device on the host."""
+    return [m.dev_name for m in ap.QueryDeviceMetrics()]
 
 
 class APFacade(object):
-    def __init__(self, dev_name=None):
+    def __init__(self, dev_name=None, chunk_size=settings.DEFAULT_CHUNK_SZ, scan_depth=settings.SCAN_DEPTH,
+                 observer=None):
         if dev_name:
             self.dev_name = dev_name
         else:
             metrics = ap.QueryDeviceMetrics()
             self.dev_name = metrics[0].dev_name
 
+        self.chunk_size = chunk_size
+        self.scan_depth = scan_depth
+        self.observer = observer or Observer()
         self.device = ap.Device()
         self.rtos = []
         self.flows = []
@@ -18,17 +31,26 @@ class APFacade(object):
     def setup(self):
         ap.ConfigureDevice(self.dev_name)
         self.device.OpenDevice(self.dev_name)
-    
+
+    def get_rank_count(self):
+        """"""
+        for metrics in ap.QueryDeviceMetrics():
+            if metrics.dev_name == self.dev_name:
+                return metrics.rank_count
+        return ap.QueryDeviceMetrics()[0].rank_count
+
     def load(self, fsms):
-        try:
-            for fsm in fsms:
-                self.rtos.append(self.device.Load(0, fsm))
-        except TypeError:
-            self.rtos.append(self.device.Load(0, fsms))
+        with self.observer.timer('load'):
+            try:
+                for fsm in fsms:
+                    self.rtos.append(self.device.Load(0, fsm))
+            except TypeError:
+                self.rtos.append(self.device.Load(0, fsms))
 
     def unload(self):
-        for rto in self.rtos:
-            rto.Unload()
+        with self.observer.timer('unload'):
+            for rto in self.rtos:
+                rto.Unload()
         self.rtos = []
 
     def open_flows(self):
@@ -40,22 +62,38 @@ class APFacade(object):
             flow.Close()
         self.flows = []
 
-    # TODO: support data as a file handle for more efficient memory usage/chunking
-    def scan(self, data, chunk_size=settings.DEFAULT_CHUNK_SZ):
-        reports = []
-        i = 0
-        while i < len(data):
-            chunk = data[i:i + chunk_size]
-            wait = self.device.ScanFlows([(x, chunk) for x in self.flows])
-            i += chunk_size
-        self.device.Wait(wait)
+    def scan(self, data, chunk_size=None):
+        """Scans data through every open flow and returns the reports.
+
+        Args:
+            data: A str, bytearray, memoryview, mmap or open binary file. Chunks
+                  are handed to the device as views, so nothing is copied.
+            chunk_size: Bytes per ScanFlows call; defaults to self.chunk_size.
+
+        At most scan_depth calls are outstanding; the oldest is waited on
+        before the next chunk is submitted.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        waits = deque()
+        with utils.scan_buffer(data) as buf:
+            with self.observer.timer('scan'):
+                for i in xrange(0, len(buf), chunk_size):
+                    if len(waits) >= self.scan_depth:
+                        self.device.Wait(waits.popleft())
+                    chunk = utils.chunk_view(buf, i, chunk_size)
+                    waits.append(self.device.ScanFlows([(x, chunk) for x in self.flows]))
+                while waits:
+                    self.device.Wait(waits.popleft())
+            self.observer.count('bytes', len(buf) * len(self.flows))
         return self.get_reports_()
 
     def get_reports_(self):
         reports = []
-        for batch in iter(self.device.GetMatches, []):
-            for report in batch:
-                reports.append(report)
+        with self.observer.timer('drain'):
+            for batch in iter(self.device.GetMatches, []):
+                for report in batch:
+                    reports.append(report)
+        self.observer.count('reports', len(reports))
         return reports
 
     def execute(self, fsm, data):
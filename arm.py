@@ -1,51 +1,149 @@
-import itertools
+import array
 import os
 
-import micronap.sdk as ap
-
-from apfacade import APFacade
+from apfacade import APFacade, query_device_names
+from cache import AutomataCache
+from cpufacade import CPUFacade
 import settings
+from stats import Observer
 import utils
 
+ap = utils.LazyModule('micronap.sdk')
+
+# Counter target parameters of ItemsetMacro, by number of counters
+COUNTER_PARAMS = {
+    1: ['%msp'],
+    2: ['%p_msp', '%q_msp'],
+    3: ['%p_msp', '%q_msp', '%r_msp'],
+}
+
 
 class ARM(object):
-    def __init__(self, initial_items, min_support, num_id_bytes=1, dev_name=settings.DEV_NAME):
-        """"""
+    def __init__(self, initial_items, min_support, num_id_bytes=1, dev_name=settings.DEV_NAME,
+                 pipeline_depth=settings.PIPELINE_DEPTH, cache=None, observer=None):
+        """Constructor.
+
+        Args:
+            dev_name: AP device name, a comma separated list of them,
+                      settings.ALL_DEV_NAME for every device on the host, or
+                      settings.CPU_DEV_NAME for the host CPU.
+            observer: stats.Observer receiving counters and timings of each
+                      iteration, shared with the device facades.
+        """
         self.min_support = min_support
+        self.pipeline_depth = pipeline_depth
         self.num_id_bytes = num_id_bytes
         self.items = set(initial_items)
         self.itemsets = set([frozenset([x]) for x in self.items])
+        self.levels = {1: set(self.itemsets)}
 
         self.k = None
         self.factors = utils.get_counter_factors(self.min_support)
         self.num_counters = len(self.factors)
         self.candidates = None
         self.fsm = None
+        self.fsm_info = None
+        self.flow_offsets = {}
+        self.round_flows = []
+        self.round_offsets = []
         self.emap = None
+        self.mrefs = None
         self.mdef = None
+        self.item_params = None
+        self.symbols = {}
+        self.observer = observer or Observer()
 
-        self.device = APFacade(dev_name=dev_name)
-        self.device.setup()
+        if dev_name == settings.CPU_DEV_NAME:
+            self.devices = [CPUFacade(observer=self.observer)]
+        elif dev_name == settings.ALL_DEV_NAME:
+            self.devices = [APFacade(dev_name=x, observer=self.observer) for x in query_device_names()]
+        else:
+            self.devices = [APFacade(dev_name=x, observer=self.observer) for x in dev_name.split(',')]
+        self.device = self.devices[0]
+        self.software = isinstance(self.device, CPUFacade)
+        for device in self.devices:
+            device.setup()
 
-    def init_iteration(self, k):
-        """"""
+        self.cache = cache
+        self.paths = None
+        if self.cache is None and not self.software:
+            self.cache = AutomataCache()
+
+    def init_iteration(self, k, candidates=None):
+        """Starts level k.
+
+        Args:
+            candidates: The level's candidates, if the caller already
+                        generated them; by default they are generated here.
+        """
         self.k = k
         self.ick = 'i{}c{}k{}'.format(self.num_id_bytes, self.num_counters, k)
+        self.observer.begin_iteration(k)
 
-        self.restore_itemset_mdef_()
-        self.restore_itemset_fsm_()
-        self.restore_itemset_emap_()
-        self.generate_candidates_()
+        if self.software:
+            self.fsm = self.device.create_automaton(k, self.num_id_bytes, self.factors)
+            self.fsm_info = self.fsm.GetInfo()
+        else:
+            self.paths = self.cache.get(k, self.num_id_bytes, self.num_counters)
+            self.restore_itemset_mdef_()
+            self.restore_itemset_fsm_()
+            self.restore_itemset_emap_()
+            self.init_labeling_()
+        self.generate_candidates_(candidates)
 
     def execute_iteration(self, data):
-        rank_count = ap.QueryDeviceMetrics()[0].rank_count
-        macros_per_fsm = self.fsm.GetInfo().match_res
+        """Counts the support of every candidate, one board-sized round at a time.
+
+        With a pipeline depth above zero, the labeled automata of the next
+        rounds are prepared on a worker thread while the current round scans.
+        With several devices, each one scans the next unclaimed round as soon
+        as it is free, and the reports are processed in candidate order.
+        """
+        rounds = self.label_rounds_()
+        if self.pipeline_depth > 0:
+            rounds = utils.prefetch(rounds, self.pipeline_depth * len(self.devices))
+
+        if len(self.devices) == 1:
+            results = (self.scan_round_(self.device, x, data) for x in rounds)
+        else:
+            results = utils.ordered_map(lambda device, x: self.scan_round_(device, x, data), self.devices, rounds)
+
+        for reports, flows, offsets in results:
+            self.round_flows = flows
+            self.round_offsets = offsets
+            self.flow_offsets = dict(zip(flows, offsets))
+            with self.observer.timer('process'):
+                self.process_reports(reports)
+        self.observer.count('frequent', len(self.levels[self.k]))
+
+    def scan_round_(self, device, rnd, data):
+        """Scans data through one round of labeled FSMs on device.
+
+        Returns:
+            The reports, the round's flows and the first candidate index of
+            each flow.
+        """
+        fsms, offsets = rnd
+        device.load(fsms)
+        device.open_flows()
+        flows = list(device.flows)
+        try:
+            reports = device.scan(data)
+        finally:
+            device.close_flows()
+            device.unload()
+        return reports, flows, offsets
+
+    def label_rounds_(self):
+        """Yields the labeled FSMs of each round with their first candidate indices."""
+        rank_count = min(x.get_rank_count() for x in self.devices)
+        macros_per_fsm = self.fsm_info.match_res
         macros_per_board = macros_per_fsm * rank_count
         tot_rem = len(self.candidates)
         i = 0
-        reports = []
         while tot_rem > 0:
             fsms = []
+            offsets = []
             rnd_rem = min(tot_rem, macros_per_board)
             tot_rem -= rnd_rem
             while rnd_rem > 0:
@@ -53,108 +151,140 @@ class ARM(object):
                 fsm = self.fsm.Duplicate()
                 fsm = self.label_candidates_(fsm, i, i + fsm_rem)
                 fsms.append(fsm)
+                offsets.append(i)
                 rnd_rem -= fsm_rem
                 i += fsm_rem
-
-            self.device.load(fsms)
-            self.device.open_flows()
-            reports += self.device.scan(data)
-            self.process_reports(reports)
-            self.device.close_flows()
-            self.device.unload()
+            self.observer.count('rounds')
+            self.observer.count('fsms', len(fsms))
+            yield fsms, offsets
 
     def restore_itemset_mdef_(self):
         """"""
-        path = os.path.join(settings.ANML_PATH, '{}.anml'.format(self.ick))
         anml = ap.Anml()
-        self.mdef = anml.LoadAnmlMacro(path)
+        self.mdef = anml.LoadAnmlMacro(self.paths['anml'])
 
     def restore_itemset_fsm_(self):
         """"""
-        path = os.path.join(settings.FSM_PATH, '{}.fsm'.format(self.ick))
         self.fsm = ap.Automaton()
-        self.fsm.Restore(path)
+        self.fsm.Restore(self.paths['fsm'])
+        self.fsm_info = self.fsm.GetInfo()
 
     def restore_itemset_emap_(self):
         """"""
-        path = os.path.join(settings.MAP_PATH, '{}.map'.format(self.ick))
         self.emap = ap.ElementMap()
-        self.emap.RestoreElementMap(path)
+        self.emap.RestoreElementMap(self.paths['map'])
+        self.mrefs = self.restore_mrefs_(self.paths['map'])
+
+    def restore_mrefs_(self, map_path):
+        """Returns the element ref of every macro slot in the FSM, in slot order.
+
+        The refs only depend on the compiled automaton, so they are cached in a
+        .mref file next to the element map and reused while it is newer than
+        the map.
+        """
+        path = '{}.mref'.format(os.path.splitext(map_path)[0])
+        count = self.fsm_info.match_res
+        if settings.CACHE_MREFS and os.path.isfile(path) and os.path.getmtime(path) >= os.path.getmtime(map_path):
+            mrefs = array.array('l')
+            with open(path, 'rb') as fh:
+                mrefs.fromstring(fh.read())
+            if len(mrefs) == count:
+                return mrefs
 
-    def generate_candidates_(self):
+        mrefs = array.array('l', [self.emap.GetElementRefFromElementId('arm_net_{}.mref{}'.format(self.ick, i))
+                                  for i in xrange(count)])
+        if settings.CACHE_MREFS:
+            try:
+                utils.atomic_write(path, mrefs.tostring())
+            except (IOError, OSError):
+                pass
+        return mrefs
+
+    def generate_candidates_(self, candidates=None):
         """"""
-        self.candidates = list(itertools.combinations(self.items, self.k))
+        with self.observer.timer('generate'):
+            if candidates is None:
+                candidates = utils.apriori_gen(self.levels.get(self.k - 1, []), self.k)
+            self.candidates = candidates
+        self.levels[self.k] = set()
+        self.observer.count('candidates', len(self.candidates))
+
+    def init_labeling_(self):
+        """Resolves the macro parameters and labels the base FSM's counters.
+
+        Every macro in an FSM counts to the same min support, so the counter
+        targets are set once on self.fsm and carried over by Duplicate().
+        """
+        self.item_params = [[self.mdef.GetMacroParamFromName('%i{}{}'.format(i, j))
+                             for j in xrange(self.num_id_bytes)] for i in xrange(self.k)]
+
+        params = [self.mdef.GetMacroParamFromName(x) for x in COUNTER_PARAMS[self.num_counters]]
+        target_chgs = []
+        for mref in self.mrefs:
+            target_chgs += self.label_counter_(mref, params)
+        self.fsm.SetCounterTarget(self.emap, target_chgs)
 
     def label_candidates_(self, fsm, start, end):
         """"""
-        symbol_chgs = []
-        target_chgs = []
+        with self.observer.timer('label'):
+            if self.software:
+                return fsm.label(self.candidates[start:end])
 
-        for i in xrange(end - start):
-            mref = self.emap.GetElementRefFromElementId('arm_net_{}.mref{}'.format(self.ick, i))
-            symbol_chgs += self.label_items_(mref, self.candidates[i + start])
-            target_chgs += self.label_counter_(mref)
+            symbol_chgs = []
+            for i in xrange(end - start):
+                symbol_chgs += self.label_items_(self.mrefs[i], self.candidates[i + start])
 
-        fsm.SetSymbol(self.emap, symbol_chgs)
-        fsm.SetCounterTarget(self.emap, target_chgs)
-        return fsm
+            fsm.SetSymbol(self.emap, symbol_chgs)
+            return fsm
 
     def label_items_(self, mref, itemset):
         """"""
         changes = []
-        for i, item in enumerate(sorted(itemset)):
-            id_bytes = utils.to_base(item, settings.STE_ID_SPACE)
-            id_bytes.reverse()
-            num_zeroes = self.num_id_bytes - len(id_bytes)
-            for j in xrange(self.num_id_bytes):
-                param = self.mdef.GetMacroParamFromName('%i{}{}'.format(i, j))
-                byte = 0
-                if j >= num_zeroes: 
-                    byte = id_bytes.pop()
-                changes.append(ap.ap_symbol_change(mref, r'[\x{:02x}]'.format(byte), param))
+        for params, item in zip(self.item_params, sorted(itemset)):
+            for param, symbol in zip(params, self.item_symbols_(item)):
+                changes.append(ap.ap_symbol_change(mref, symbol, param))
         return changes
 
-    # TODO: this should be done once per FSM as an initialization step, not every iteration
-    def label_counter_(self, mref):
-        """"""
-        if self.num_counters == 1:
-            return self.label_single_precision_counter_(mref)
-        elif self.num_counters == 2:
-            return self.label_double_precision_counter_(mref)
-        else:
-            return self.label_double_precision_remainder_counter_(mref)
+    def item_symbols_(self, item):
+        """Returns the symbol set for each ID byte of item, memoized across levels."""
+        try:
+            return self.symbols[item]
+        except KeyError:
+            id_bytes = utils.to_base(item, settings.STE_ID_SPACE)
+            id_bytes = [0] * (self.num_id_bytes - len(id_bytes)) + id_bytes
+            symbols = [r'[\x{:02x}]'.format(x) for x in id_bytes[:self.num_id_bytes]]
+            self.symbols[item] = symbols
+            return symbols
 
-    def label_single_precision_counter_(self, mref):
+    def label_counter_(self, mref, params):
         """"""
-        param = self.mdef.GetMacroParamFromName('%msp')
-        return [ap.ap_counter_change(mref, self.min_support, param)]
+        return [ap.ap_counter_change(mref, target, param) for target, param in zip(self.factors, params)]
 
-    def label_double_precision_counter_(self, mref):
-        """"""
-        p_param = self.mdef.GetMacroParamFromName('%p_msp')
-        q_param = self.mdef.GetMacroParamFromName('%q_msp')
-        return [ap.ap_counter_change(mref, self.factors[0], p_param),
-                ap.ap_counter_change(mref, self.factors[1], q_param)]
+    def flow_offset_(self, flow):
+        """Returns the first candidate index of the FSM scanned by flow.
 
-    def label_double_precision_remainder_counter_(self, mref):
-        """"""
-        p_param = self.mdef.GetMacroParamFromName('%p_msp')
-        q_param = self.mdef.GetMacroParamFromName('%q_msp')
-        r_param = self.mdef.GetMacroParamFromName('%r_msp')
-        return [ap.ap_counter_change(mref, self.factors[0], p_param),
-                ap.ap_counter_change(mref, self.factors[1], q_param),
-                ap.ap_counter_change(mref, self.factors[2], r_param)]
+        The dict lookup needs the flow wrapper to hash the way it compares. A
+        report carrying a fresh proxy of its flow falls back to comparing it
+        with every flow of the round, as flows.index does.
+        """
+        try:
+            return self.flow_offsets[flow]
+        except (KeyError, TypeError):
+            return self.round_offsets[self.round_flows.index(flow)]
 
     def process_reports(self, reports):
-        """"""
-        for report in reports:
-            # FIXME: this is horrifically inefficient!
-            flow_idx = self.device.flows.index(report.flow)
-            cand_idx = (flow_idx * self.fsm.GetInfo().blocks_rect) + report.report_alias.elementRef - 1
-            itemset = self.candidates[cand_idx]
+        """Marks the candidates reported in the current round as frequent.
+
+        Each report is reduced to a (flow offset, elementRef) pair first, so a
+        candidate that reports more than once is only processed once.
+        """
+        hits = set((self.flow_offset_(r.flow), r.report_alias.elementRef) for r in reports)
+        for offset, element_ref in hits:
+            itemset = self.candidates[offset + element_ref - 1]
             for i in itemset: 
                 self.items.add(i) 
             self.itemsets.add(frozenset(itemset))
+            self.levels[len(itemset)].add(frozenset(itemset))
 
 
 # vim: nu:et:ts=4:sw=4:fdm=indent
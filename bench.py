@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+from argparse import ArgumentParser
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+import settings
+from dataset import Dataset
+from arm import ARM
+from bitmap import BitmapARM
+from eclat import EclatARM
+from fpgrowth import FPGrowthARM
+import utils
+
+ENGINES = ['automata', 'bitmap', 'fpgrowth', 'eclat']
+
+STAGES = ['parse', 'encode', 'frequent_items', 'setup', 'candidates', 'label', 'scan', 'reports', 'total']
+
+# Datasets, min supports and maximum itemset sizes to benchmark
+CASES = [
+    {'dataset': 'simple', 'min_support': '2', 'max_k': 3},
+    {'dataset': 'simple', 'min_support': '1', 'max_k': 4},
+    {'dataset': 'chess', 'min_support': '95%', 'max_k': 3},
+    {'dataset': 'chess', 'min_support': '90%', 'max_k': 4},
+    {'dataset': 'retail', 'min_support': '5%', 'max_k': 3},
+    {'dataset': 'retail', 'min_support': '2%', 'max_k': 3},
+    {'dataset': 'multi_round', 'min_support': '3000', 'max_k': 3},
+]
+
+
+def case_name(case):
+    """"""
+    return '{}-s{}-k{}'.format(case['dataset'], case['min_support'], case['max_k'])
+
+
+class StageTimer(object):
+    """Accumulates the wall time spent in each benchmark stage."""
+    def __init__(self):
+        self.times = dict((x, 0.0) for x in STAGES)
+
+    def time(self, stage, func, *args, **kwargs):
+        """Calls func, adding its run time to stage."""
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.times[stage] += time.time() - start
+
+    def wrap(self, obj, name, stage):
+        """Times every later call of the method obj.name as stage."""
+        method = getattr(obj, name)
+        setattr(obj, name, lambda *args, **kwargs: self.time(stage, method, *args, **kwargs))
+
+
+def run_case(case, engine='automata', dev_name=settings.CPU_DEV_NAME):
+    """Mines one case from scratch and returns the time spent in each stage.
+
+    The automata engine runs without pipelining, so labeling and scanning
+    are timed separately instead of overlapping.
+
+    Returns:
+        A dict of stage times in seconds, and the number of frequent itemsets.
+    """
+    timer = StageTimer()
+    start = time.time()
+
+    dataset = Dataset(os.path.join(settings.DATA_PATH, '{}.dat'.format(case['dataset'])))
+    timer.time('parse', dataset.parse_file)
+    min_support = utils.normalize_minsup(case['min_support'], dataset.num_transactions)
+    items = timer.time('frequent_items', dataset.get_frequent_items, min_support)
+
+    if engine == 'bitmap':
+        arm = timer.time('setup', BitmapARM, items, min_support, dataset.iter_transactions())
+        timer.wrap(arm, 'generate_candidates_', 'candidates')
+        timer.wrap(arm, 'count_support_', 'scan')
+    elif engine in ['fpgrowth', 'eclat']:
+        cls = FPGrowthARM if engine == 'fpgrowth' else EclatARM
+        arm = timer.time('setup', cls, items, min_support, dataset.iter_transactions(), case['max_k'])
+        timer.wrap(arm, 'execute_iteration', 'scan')
+    else:
+        arm = timer.time('setup', ARM, items, min_support, dataset.num_id_bytes, dev_name=dev_name, pipeline_depth=0)
+        timer.wrap(arm, 'generate_candidates_', 'candidates')
+        timer.wrap(arm, 'label_candidates_', 'label')
+        timer.wrap(arm, 'process_reports', 'reports')
+        for device in arm.devices:
+            timer.wrap(device, 'scan', 'scan')
+
+    for k in xrange(2, case['max_k'] + 1):
+        arm.init_iteration(k)
+        data = None
+        if engine == 'automata':
+            data = timer.time('encode', dataset.reduce_level, k, set(itertools.chain.from_iterable(arm.candidates)))
+        arm.execute_iteration(data)
+        if not arm.levels[k]:
+            break
+
+    timer.times['total'] = time.time() - start
+    return timer.times, len(arm.itemsets)
+
+def benchmark(cases, engine='automata', dev_name=settings.CPU_DEV_NAME, repeat=3, warmup=1, verbose=False):
+    """Runs every case warmup times untimed, then repeat times timed.
+
+    Returns:
+        A results dict suitable for saving as JSON and passing to compare.
+    """
+    results = {}
+    for case in cases:
+        name = case_name(case)
+        runs = []
+        itemsets = None
+        for i in xrange(warmup + repeat):
+            times, itemsets = run_case(case, engine, dev_name)
+            if i >= warmup:
+                runs.append(times)
+        stages = {}
+        for stage in STAGES:
+            values = [x[stage] for x in runs]
+            stages[stage] = {'min': min(values), 'median': float(np.median(values)), 'runs': values}
+        results[name] = {'case': case, 'itemsets': itemsets, 'stages': stages}
+        if verbose:
+            print '{:<28} {:>8} itemsets {:>10.4f}s'.format(name, itemsets, stages['total']['median'])
+
+    return {
+        'engine': engine,
+        'device': dev_name,
+        'repeat': repeat,
+        'warmup': warmup,
+        'python': platform.python_version(),
+        'host': platform.node(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+def compare(baseline, current, tolerance=0.1, floor=1e-3):
+    """Finds the stages that got slower than the baseline.
+
+    A stage regresses when its median time exceeds the baseline median by
+    more than tolerance (a fraction) and by more than floor seconds, which
+    keeps timer noise on tiny stages from being flagged. A case whose number
+    of frequent itemsets changed is always reported.
+
+    Returns:
+        A list of (case name, stage, baseline seconds, current seconds) tuples;
+        the stage is 'itemsets' for a changed result, with the counts instead
+        of times.
+    """
+    regressions = []
+    for name, result in sorted(current['results'].iteritems()):
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        if base['itemsets'] != result['itemsets']:
+            regressions.append((name, 'itemsets', base['itemsets'], result['itemsets']))
+        for stage in STAGES:
+            old = base['stages'][stage]['median']
+            new = result['stages'][stage]['median']
+            if new > old * (1 + tolerance) and new - old > floor:
+                regressions.append((name, stage, old, new))
+    return regressions
+
+def parse_args():
+    """"""
+    parser = ArgumentParser(description='Times each stage of mining the bundled datasets')
+    parser.add_argument('--device', '-d', default=settings.CPU_DEV_NAME, help='AP device name, or "{}" to run the automata on the host CPU'.format(settings.CPU_DEV_NAME))
+    parser.add_argument('--engine', '-e', choices=ENGINES, default='automata', help='Support counting engine')
+    parser.add_argument('--case', '-c', action='append', help='Only run cases whose name starts with this prefix (repeatable)')
+    parser.add_argument('--repeat', '-r', type=int, default=settings.BENCH_REPEAT, help='Timed runs per case')
+    parser.add_argument('--warmup', '-w', type=int, default=settings.BENCH_WARMUP, help='Untimed runs per case')
+    parser.add_argument('--output', '-o', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='Flag regressions against a stored results file')
+    parser.add_argument('--tolerance', '-t', type=float, default=settings.BENCH_TOLERANCE, help='Allowed slowdown as a fraction of the baseline')
+    parser.add_argument('--list', action='store_true', default=False, help='List the cases and exit')
+    parser.add_argument('--verbose', '-v', action='store_true', default=False)
+    return parser.parse_args()
+
+def main():
+    """"""
+    args = parse_args()
+    cases = CASES
+    if args.case:
+        cases = [x for x in CASES if any(case_name(x).startswith(p) for p in args.case)]
+    if args.list:
+        for case in cases:
+            print case_name(case)
+        return
+
+    current = benchmark(cases, args.engine, args.device, args.repeat, args.warmup, args.verbose)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(current, fh, indent=2, sort_keys=True)
+    else:
+        print json.dumps(current, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        regressions = compare(baseline, current, args.tolerance)
+        for name, stage, old, new in regressions:
+            print >> sys.stderr, 'REGRESSION {} {}: {} -> {}'.format(name, stage, old, new)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
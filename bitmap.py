@@ -0,0 +1,126 @@
+import itertools
+
+import numpy as np
+
+import settings
+from stats import Observer
+import utils
+
+# Number of set bits in every 16-bit value
+POPCOUNT_TABLE = np.zeros(2**16, dtype=np.uint8)
+for _b in xrange(16):
+    POPCOUNT_TABLE += ((np.arange(2**16) >> _b) & 1).astype(np.uint8)
+
+
+def popcount_rows(bitsets):
+    """Returns the number of set bits in each row of a 2D uint8 array."""
+    return POPCOUNT_TABLE[bitsets.view(np.uint16)].sum(axis=1, dtype=np.int64)
+
+
+class BitmapARM(object):
+    """Vertical bitmap support counting with the same interface as ARM.
+
+    Every frequent item is stored as a packed bitset of the transactions that
+    contain it. The support of a candidate is the popcount of the AND of its
+    items' bitsets, which is computed for a whole batch of candidates at once.
+    """
+    def __init__(self, initial_items, min_support, transactions, observer=None):
+        """Constructor.
+
+        Args:
+            initial_items: Frequent 1-items, as returned by get_frequent_items.
+            min_support: Minimum support as an absolute number of transactions.
+            transactions: Iterable of parsed transactions, e.g. from
+                          Dataset.iter_transactions.
+            observer: stats.Observer receiving counters and timings of each
+                      iteration.
+        """
+        self.min_support = min_support
+        self.observer = observer or Observer()
+        self.items = set(initial_items)
+        self.itemsets = set([frozenset([x]) for x in self.items])
+        self.levels = {1: set(self.itemsets)}
+        self.supports = {}
+
+        self.k = None
+        self.candidates = None
+
+        self.item_index = dict((x, i) for i, x in enumerate(sorted(self.items)))
+        self.bitsets = self.build_bitsets_(transactions)
+        for item, i in self.item_index.iteritems():
+            self.supports[frozenset([item])] = int(popcount_rows(self.bitsets[i:i + 1])[0])
+
+    def build_bitsets_(self, transactions):
+        """"""
+        tids = [[] for _ in xrange(len(self.item_index))]
+        num_transactions = 0
+        for tid, row in enumerate(transactions):
+            num_transactions += 1
+            for item in row:
+                try:
+                    tids[self.item_index[item]].append(tid)
+                except KeyError:
+                    pass
+
+        # Pad rows to a whole number of 64-bit words
+        num_bytes = ((num_transactions + 63) // 64) * 8
+        bitsets = np.zeros((len(tids), num_bytes), dtype=np.uint8)
+        for i, row_tids in enumerate(tids):
+            row_tids = np.array(row_tids, dtype=np.int64)
+            np.bitwise_or.at(bitsets[i], row_tids >> 3, (128 >> (row_tids & 7)).astype(np.uint8))
+        return bitsets
+
+    def init_iteration(self, k, candidates=None):
+        """Starts level k.
+
+        Args:
+            candidates: The level's candidates, if the caller already
+                        generated them; by default they are generated here.
+        """
+        self.k = k
+        self.observer.begin_iteration(k)
+        self.generate_candidates_(candidates)
+
+    def execute_iteration(self, data=None):
+        """Counts the support of every candidate of the current level.
+
+        Args:
+            data: Unused; the transactions are already held as bitsets. Accepted
+                  so the engine can be driven exactly like ARM.
+        """
+        batch_size = settings.BITMAP_BATCH_SZ
+        for start in xrange(0, len(self.candidates), batch_size):
+            batch = self.candidates[start:start + batch_size]
+            with self.observer.timer('scan'):
+                counts = self.count_support_(batch)
+            for itemset, count in itertools.izip(batch, counts):
+                if count >= self.min_support:
+                    for i in itemset:
+                        self.items.add(i)
+                    self.itemsets.add(frozenset(itemset))
+                    self.levels[self.k].add(frozenset(itemset))
+                    self.supports[frozenset(itemset)] = int(count)
+        self.observer.count('frequent', len(self.levels[self.k]))
+
+    def generate_candidates_(self, candidates=None):
+        """"""
+        with self.observer.timer('generate'):
+            if candidates is None:
+                candidates = utils.apriori_gen(self.levels.get(self.k - 1, []), self.k)
+            self.candidates = candidates
+        self.levels[self.k] = set()
+        self.observer.count('candidates', len(self.candidates))
+
+    def count_support_(self, candidates):
+        """Returns the exact support of each candidate as a NumPy array."""
+        if not candidates:
+            return np.zeros(0, dtype=np.int64)
+
+        rows = np.array([[self.item_index[x] for x in c] for c in candidates], dtype=np.intp)
+        acc = self.bitsets[rows[:, 0]]
+        for j in xrange(1, rows.shape[1]):
+            acc &= self.bitsets[rows[:, j]]
+        return popcount_rows(acc)
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,120 @@
+import hashlib
+import inspect
+import os
+import shutil
+import tempfile
+
+import pkg_resources
+
+import create_fsms
+import macros
+import settings
+import utils
+
+ap = utils.LazyModule('micronap.sdk')
+
+ARTIFACTS = ['anml', 'fsm', 'map']
+
+
+def sdk_version():
+    """Returns the version string of the installed AP SDK."""
+    try:
+        return ap.__version__
+    except (AttributeError, ImportError):
+        try:
+            return pkg_resources.get_distribution('micronap').version
+        except pkg_resources.DistributionNotFound:
+            return 'unknown'
+
+def macro_hash():
+    """Returns a digest of everything that determines a compiled ItemsetMacro."""
+    digest = hashlib.sha1(inspect.getsource(macros))
+    digest.update(inspect.getsource(create_fsms.compile_automaton))
+    for name in ['DEFAULT_DELIM', 'DEFAULT_SYMBOL', 'DEFAULT_TARGET', 'BLK_PER_RANK', 'STE_ID_SPACE']:
+        digest.update('{}={}'.format(name, getattr(settings, name)))
+    return digest.hexdigest()
+
+
+class AutomataCache(object):
+    """Compiled automata, compiled on first use and stored by content key.
+
+    Each entry is a directory holding the .anml/.fsm/.map triple of one
+    i{id_bytes}c{counters}k{k} automaton. Its name includes a digest of the
+    macro definition and the SDK version, so artifacts built from an older
+    ItemsetMacro are never loaded. Entries are written atomically and the
+    least recently used ones are removed once the cache exceeds its budget.
+    """
+    def __init__(self, path=settings.AUTOMATA_CACHE_PATH, budget=settings.AUTOMATA_CACHE_BUDGET, verbose=False):
+        """Constructor.
+
+        Args:
+            path: Directory holding the cache entries.
+            budget: Disk budget in bytes.
+            verbose: Print compile progress.
+        """
+        self.path = path
+        self.budget = budget
+        self.verbose = verbose
+        self.version = '{}-{}'.format(macro_hash(), sdk_version())
+
+    def key(self, k, id_bytes, num_counters):
+        """"""
+        digest = hashlib.sha1('{}:{}:{}:{}'.format(id_bytes, num_counters, k, self.version)).hexdigest()
+        return 'i{}c{}k{}-{}'.format(id_bytes, num_counters, k, digest[:16])
+
+    def get(self, k, id_bytes, num_counters):
+        """Returns the artifact paths of an automaton, compiling it if needed.
+
+        Returns:
+            A dict mapping 'anml', 'fsm' and 'map' to file paths.
+        """
+        ick = 'i{}c{}k{}'.format(id_bytes, num_counters, k)
+        entry = os.path.join(self.path, self.key(k, id_bytes, num_counters))
+        if not os.path.isdir(entry):
+            self.compile_(k, id_bytes, num_counters, entry)
+            self.evict_(keep=entry)
+
+        # Directory mtimes record when each entry was last used
+        os.utime(entry, None)
+        return dict((x, os.path.join(entry, '{}.{}'.format(ick, x))) for x in ARTIFACTS)
+
+    def compile_(self, k, id_bytes, num_counters, entry):
+        """Compiles an automaton into a scratch directory and moves it into place."""
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        tmp = tempfile.mkdtemp(prefix='.tmp-', dir=self.path)
+        try:
+            create_fsms.create_macro_def(k, id_bytes, num_counters, anml_path=tmp)
+            create_fsms.compile_automaton(k, id_bytes, num_counters, verbose=self.verbose,
+                                          anml_path=tmp, fsm_path=tmp, map_path=tmp)
+            try:
+                os.rename(tmp, entry)
+            except OSError:
+                # Another process stored the same entry first
+                if not os.path.isdir(entry):
+                    raise
+        finally:
+            if os.path.isdir(tmp):
+                shutil.rmtree(tmp)
+
+    def evict_(self, keep=None):
+        """Removes least recently used entries until the cache fits its budget."""
+        entries = []
+        for name in os.listdir(self.path):
+            entry = os.path.join(self.path, name)
+            if name.startswith('.') or not os.path.isdir(entry):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, x)) for x in os.listdir(entry))
+            entries.append((os.path.getmtime(entry), size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.budget:
+                break
+            if entry != keep:
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import time
+
+import settings
+
+MACROS_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'macros.py')
+
+MAX_LOAD_SIZE = 8
+
+
+def fits(blocks_rect, load_size):
+    """Returns whether a compiled automaton fits in one rank."""
+    return blocks_rect <= settings.BLK_PER_RANK and load_size is not None and load_size <= MAX_LOAD_SIZE
+
+def search_capacity(fits_count, lo=0, hi=None, guess=1, deadline=None):
+    """Finds the largest macro count for which fits_count(count) is true.
+
+    Gallops away from guess with doubling steps until the answer is bracketed
+    by a count that fits and one that does not, then binary searches between
+    them. If the deadline passes first, the largest count seen to fit so far
+    is returned.
+
+    Args:
+        fits_count: Function compiling count macros and returning whether they fit.
+        lo: A count known to fit, or 0.
+        hi: A count known not to fit, or None.
+        guess: Estimated capacity to start from.
+        deadline: time.time() value after which the search stops early.
+
+    Returns:
+        The largest count known to fit, or 0 if even one macro does not fit.
+    """
+    def expired():
+        return deadline is not None and time.time() >= deadline
+
+    count = max(guess, lo + 1)
+    if hi is not None:
+        count = min(count, hi - 1)
+
+    step = 1
+    while not expired() and not (hi is not None and (lo > 0 or hi == 1)):
+        if fits_count(count):
+            lo = count
+        else:
+            hi = count
+        if hi is None:
+            count = lo + step
+        elif lo == 0:
+            count = max(1, hi - step)
+        step *= 2
+
+    while hi is not None and hi - lo > 1 and not expired():
+        count = (lo + hi) // 2
+        if fits_count(count):
+            lo = count
+        else:
+            hi = count
+
+    return lo
+
+
+class CapacityDB(object):
+    """Compile results of automata built from ItemsetMacro references.
+
+    Every (ick, count, blocks_rect, load size) result is appended as one JSON
+    line, which keeps concurrent writers from clobbering each other. Records
+    from a different ItemsetMacro definition are ignored.
+    """
+    def __init__(self, path=settings.CAPACITY_DB):
+        self.path = path
+        with open(MACROS_SOURCE) as fh:
+            self.version = hashlib.sha1(fh.read()).hexdigest()
+
+    def record(self, ick, count, blocks_rect, load_size):
+        """"""
+        if load_size == float('inf'):
+            load_size = None
+        line = json.dumps({'ick': ick, 'count': count, 'blocks_rect': blocks_rect,
+                           'load_size': load_size, 'macro': self.version})
+        with open(self.path, 'a') as fh:
+            fh.write(line + '\n')
+
+    def records(self, ick):
+        """Returns the compile results recorded for ick."""
+        if not os.path.isfile(self.path):
+            return []
+
+        records = []
+        with open(self.path) as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record['ick'] == ick and record['macro'] == self.version:
+                    records.append(record)
+        return records
+
+    def bounds(self, ick):
+        """Returns the largest count known to fit (or 0) and the smallest known not to (or None)."""
+        lo = 0
+        hi = None
+        for r in self.records(ick):
+            if fits(r['blocks_rect'], r['load_size']):
+                lo = max(lo, r['count'])
+            elif hi is None or r['count'] < hi:
+                hi = r['count']
+        return lo, hi
+
+    def capacity(self, ick):
+        """Returns the macros per rank for ick once the search has settled it, else None."""
+        lo, hi = self.bounds(ick)
+        if hi is not None and hi - lo == 1:
+            return lo
+        return None
+
+    def estimate(self, ick):
+        """Estimates the capacity of ick from the blocks used at the largest fitting count."""
+        best = None
+        for r in self.records(ick):
+            if fits(r['blocks_rect'], r['load_size']) and (best is None or r['count'] > best['count']):
+                best = r
+        if best is None or not best['blocks_rect']:
+            return None
+        return max(1, settings.BLK_PER_RANK * best['count'] // best['blocks_rect'])
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+
+import utils
+
+STATE_FILE = 'state.json'
+DATA_FILE = 'data.npz'
+
+# Bytes hashed at each end of a dataset file while fingerprinting it
+FINGERPRINT_BLOCK_SZ = 2**20
+
+
+def fingerprint(path):
+    """Returns a digest identifying a dataset file.
+
+    The digest covers the size and modification time of the file and its
+    first and last blocks, so it takes the same time however large the file
+    is. An edit keeping the size and the time of the file, and touching
+    neither end, goes unnoticed.
+    """
+    info = os.stat(path)
+    digest = hashlib.sha1('{} {}'.format(info.st_size, info.st_mtime))
+    with open(path, 'rb') as fh:
+        digest.update(fh.read(FINGERPRINT_BLOCK_SZ))
+        fh.seek(max(info.st_size - FINGERPRINT_BLOCK_SZ, 0))
+        digest.update(fh.read(FINGERPRINT_BLOCK_SZ))
+    return digest.hexdigest()
+
+
+class Checkpoint(object):
+    """Mining state saved after every finished level, so a run can resume.
+
+    A checkpoint is a directory holding the parsed and encoded dataset
+    (written once), one JSON file of frequent itemsets per level, and a state
+    file naming the last finished level. Every file is written atomically and
+    the state file is written last, so a crash at any point leaves the
+    previous checkpoint intact.
+    """
+    def __init__(self, path):
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def level_path_(self, k):
+        """"""
+        return os.path.join(self.path, 'level{}.json'.format(k))
+
+    def has_dataset(self):
+        """"""
+        return os.path.isfile(os.path.join(self.path, DATA_FILE))
+
+    def save_dataset(self, dataset):
+        """"""
+        dataset.save_arrays(os.path.join(self.path, DATA_FILE))
+
+    def load_dataset(self, dataset):
+        """"""
+        dataset.load_arrays(os.path.join(self.path, DATA_FILE))
+
+    def save_level(self, engine, k, params, output_size=None):
+        """Saves level k of engine, marking it as the last finished level.
+
+        Args:
+            engine: ARM or BitmapARM after execute_iteration.
+            k: Finished level.
+            params: Dict of the run parameters a resumed run must match, e.g.
+                    the dataset fingerprint and min support.
+            output_size: Size of the result file once level k was written.
+        """
+        supports = getattr(engine, 'supports', None)
+        itemsets = []
+        for itemset in engine.levels[k]:
+            record = {'items': sorted(itemset)}
+            if supports is not None:
+                record['support'] = supports[itemset]
+            itemsets.append(record)
+        utils.atomic_write(self.level_path_(k), json.dumps(itemsets))
+
+        state = {'k': k, 'params': params, 'items': sorted(engine.items), 'output_size': output_size}
+        utils.atomic_write(os.path.join(self.path, STATE_FILE), json.dumps(state))
+
+    def load(self):
+        """Returns the saved state, or None if no level has finished yet."""
+        try:
+            with open(os.path.join(self.path, STATE_FILE)) as fh:
+                return json.load(fh)
+        except IOError:
+            return None
+
+    def restore(self, engine, state):
+        """Loads every finished level of state into a freshly created engine."""
+        supports = getattr(engine, 'supports', None)
+        for k in xrange(1, state['k'] + 1):
+            with open(self.level_path_(k)) as fh:
+                records = json.load(fh)
+            level = set()
+            for record in records:
+                itemset = frozenset(record['items'])
+                level.add(itemset)
+                if supports is not None and 'support' in record:
+                    supports[itemset] = record['support']
+            engine.levels[k] = level
+            engine.itemsets.update(level)
+        engine.items = set(state['items'])
+        engine.k = state['k']
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,289 @@
+from collections import namedtuple
+
+import settings
+from stats import Observer
+import utils
+
+AutomatonInfo = namedtuple('AutomatonInfo', ['match_res', 'blocks_rect'])
+ReportAlias = namedtuple('ReportAlias', ['elementRef'])
+Report = namedtuple('Report', ['flow', 'byte_offset', 'report_alias'])
+
+STOP_HOLD = 0
+STOP_PULSE = 1
+
+
+def iter_bits(vector):
+    """Yields the indices of the set bits in vector, lowest first."""
+    while vector:
+        low = vector & -vector
+        yield low.bit_length() - 1
+        vector ^= low
+
+
+class ItemsetAutomaton(object):
+    """Software model of an automaton built from ItemsetMacro references.
+
+    Mirrors the parts of micronap.sdk.Automaton used by ARM (Duplicate and
+    GetInfo), so a CPUFacade can be handed the same kind of objects as an
+    APFacade. Each macro reference is labeled with one candidate itemset.
+    """
+    def __init__(self, k, id_bytes, factors, capacity=settings.CPU_MACROS_PER_FSM):
+        """Constructor.
+
+        Args:
+            k: Number of items in itemset.
+            id_bytes: Number of bytes required to encode item IDs (1 or 2).
+            factors: Counter targets, as returned by utils.get_counter_factors.
+            capacity: Maximum number of macro references in the automaton.
+        """
+        self.k = k
+        self.id_bytes = id_bytes
+        self.factors = list(factors)
+        self.capacity = capacity
+        self.symbols = []
+
+    def Duplicate(self):
+        """Returns an unlabeled copy of this automaton."""
+        return ItemsetAutomaton(self.k, self.id_bytes, self.factors, self.capacity)
+
+    def GetInfo(self):
+        """"""
+        return AutomatonInfo(match_res=self.capacity, blocks_rect=self.capacity)
+
+    def label(self, itemsets):
+        """Labels one macro reference per itemset, in order."""
+        if len(itemsets) > self.capacity:
+            raise ValueError('automaton holds at most {} itemsets'.format(self.capacity))
+
+        self.symbols = []
+        for itemset in itemsets:
+            symbols = []
+            for item in sorted(itemset):
+                id_bytes = utils.to_base(item, settings.STE_ID_SPACE)
+                symbols += [0] * (self.id_bytes - len(id_bytes)) + id_bytes
+            self.symbols.append(symbols)
+        return self
+
+
+class Counter(object):
+    """Bit-parallel counter element shared by every macro in a flow."""
+    def __init__(self, target, mode, size):
+        self.target = target
+        self.mode = mode
+        self.counts = [0] * size
+        self.stopped = 0
+        self.held = 0
+
+    def step(self, count, reset):
+        """Advances one symbol cycle and returns the output vector."""
+        if reset:
+            for i in iter_bits(reset):
+                self.counts[i] = 0
+            self.stopped &= ~reset
+            self.held &= ~reset
+
+        reached = 0
+        for i in iter_bits(count & ~reset & ~self.stopped):
+            self.counts[i] += 1
+            if self.counts[i] >= self.target:
+                reached |= 1 << i
+
+        self.stopped |= reached
+        if self.mode == STOP_HOLD:
+            self.held |= reached
+            return self.held
+        return reached
+
+
+class CPUFlow(object):
+    """Scan state of one loaded ItemsetAutomaton.
+
+    Every element of the ItemsetMacro network is a state vector with one bit
+    per macro reference, so each input symbol costs a fixed number of integer
+    operations regardless of how many itemsets are loaded.
+    """
+    def __init__(self, fsm):
+        self.fsm = fsm
+        self.size = len(fsm.symbols)
+        self.full = (1 << self.size) - 1
+        self.offset = 0
+
+        # Per item byte position, the macros whose label matches each symbol
+        self.sym_masks = []
+        for pos in xrange(fsm.k * fsm.id_bytes):
+            masks = {}
+            for i, symbols in enumerate(fsm.symbols):
+                masks[symbols[pos]] = masks.get(symbols[pos], 0) | (1 << i)
+            self.sym_masks.append(masks)
+
+        self.start = 0
+        if fsm.id_bytes == 1:
+            self.items = [0] * (fsm.k + 1)
+            self.holds = [0] * (fsm.k + 1)
+        else:
+            self.items = [0] * (2 * fsm.k)
+            self.holds = [0] * (2 * fsm.k)
+
+        self.init_counters_()
+        self.out = 0
+        self.eod1 = 0
+
+    def init_counters_(self):
+        """"""
+        factors = self.fsm.factors
+        if len(factors) == 1:
+            self.counters = [Counter(factors[0], STOP_HOLD, self.size)]
+        elif len(factors) == 2:
+            self.counters = [Counter(factors[0], STOP_PULSE, self.size),
+                             Counter(factors[1], STOP_HOLD, self.size)]
+        else:
+            self.counters = [Counter(factors[0], STOP_PULSE, self.size),
+                             Counter(factors[1], STOP_HOLD, self.size),
+                             Counter(factors[2], STOP_HOLD, self.size)]
+        self.counter_outs = [0] * len(self.counters)
+        self.and_out = 0
+
+    def scan(self, chunk, reports):
+        """Runs chunk through the network, appending any reports."""
+        for symbol in bytearray(chunk):
+            delim = symbol == settings.DEFAULT_DELIM
+            if self.fsm.id_bytes == 1:
+                last = self.step_single_precision_chain_(symbol, delim)
+            else:
+                last = self.step_double_precision_chain_(symbol, delim)
+            out = self.step_support_counter_(last)
+
+            # End delimiters, which report one cycle after each other
+            eod2 = self.eod1 if delim else 0
+            self.eod1 = self.out if delim else 0
+            self.out = out
+
+            for i in iter_bits(eod2):
+                reports.append(Report(self, self.offset, ReportAlias(i + 1)))
+            self.offset += 1
+
+    def step_single_precision_chain_(self, symbol, delim):
+        """"""
+        items, holds = self.items, self.holds
+        prev = self.start
+        for i in xrange(len(items)):
+            enabled = prev | holds[i]
+            prev = items[i]
+            if i < len(self.sym_masks):
+                items[i] = enabled & self.sym_masks[i].get(symbol, 0)
+            else:
+                items[i] = enabled if delim else 0
+            holds[i] = 0 if delim else enabled
+        self.start = self.full if delim else 0
+        return items[-1]
+
+    def step_double_precision_chain_(self, symbol, delim):
+        """"""
+        items, holds = self.items, self.holds
+        prev = self.start
+        for i in xrange(0, len(items), 2):
+            enabled = prev | holds[i + 1]
+            prev = items[i + 1]
+            items[i + 1] = items[i] & self.sym_masks[i + 1].get(symbol, 0)
+            items[i] = enabled & self.sym_masks[i].get(symbol, 0)
+            holds[i + 1] = 0 if delim else holds[i]
+            holds[i] = 0 if delim else enabled
+        self.start = self.full if delim else 0
+        return items[-1]
+
+    def step_support_counter_(self, last):
+        """Advances the counters and returns the vector enabling eod1."""
+        outs = self.counter_outs
+        if len(self.counters) == 1:
+            outs[0] = self.counters[0].step(last, 0)
+            return outs[0]
+        elif len(self.counters) == 2:
+            p, q = self.counters
+            pad = outs[0]
+            outs[0] = p.step(last, pad)
+            outs[1] = q.step(pad, 0)
+            return outs[1]
+        else:
+            p, q, r = self.counters
+            pq_pad, post_q_pad, post_r_pad = outs
+            post_and_pad = self.and_out
+            self.and_out = post_q_pad & post_r_pad
+            outs[0] = p.step(last, pq_pad | post_and_pad)
+            outs[1] = q.step(pq_pad, 0)
+            outs[2] = r.step(last, pq_pad)
+            return self.and_out
+
+    def close(self):
+        """"""
+        self.fsm = None
+
+
+class CPUFacade(object):
+    """Drop-in replacement for APFacade that runs automata on the host CPU."""
+    def __init__(self, dev_name=settings.CPU_DEV_NAME, chunk_size=settings.CPU_CHUNK_SZ, observer=None):
+        self.dev_name = dev_name
+        self.chunk_size = chunk_size
+        self.observer = observer or Observer()
+        self.rtos = []
+        self.flows = []
+        self.reports = []
+
+    def setup(self):
+        """"""
+        pass
+
+    def get_rank_count(self):
+        """"""
+        return settings.CPU_RANK_COUNT
+
+    def create_automaton(self, k, id_bytes, factors):
+        """Returns an unlabeled ItemsetAutomaton for the given macro shape."""
+        return ItemsetAutomaton(k, id_bytes, factors)
+
+    def load(self, fsms):
+        try:
+            for fsm in fsms:
+                self.rtos.append(fsm)
+        except TypeError:
+            self.rtos.append(fsms)
+
+    def unload(self):
+        self.rtos = []
+
+    def open_flows(self):
+        for rto in self.rtos:
+            self.flows.append(CPUFlow(rto))
+
+    def close_flows(self):
+        for flow in self.flows:
+            flow.close()
+        self.flows = []
+
+    def scan(self, data, chunk_size=None):
+        """Scans data through every open flow; see APFacade.scan."""
+        chunk_size = chunk_size or self.chunk_size
+        with utils.scan_buffer(data) as buf:
+            with self.observer.timer('scan'):
+                for i in xrange(0, len(buf), chunk_size):
+                    chunk = utils.chunk_view(buf, i, chunk_size)
+                    for flow in self.flows:
+                        flow.scan(chunk, self.reports)
+            self.observer.count('bytes', len(buf) * len(self.flows))
+        return self.get_reports_()
+
+    def get_reports_(self):
+        reports = self.reports
+        self.reports = []
+        self.observer.count('reports', len(reports))
+        return reports
+
+    def execute(self, fsm, data):
+        self.load(fsm)
+        self.open_flows()
+        reports = self.scan(data)
+        self.close_flows()
+        self.unload()
+        return reports
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -1,25 +1,29 @@
 #!/usr/bin/env python
 from argparse import ArgumentParser
+import multiprocessing
 import os
+import subprocess
+import sys
 import time
 
-import micronap.sdk as ap
-
+import capacity
 import settings
 from macros import ItemsetMacro
 import utils
 
+ap = utils.LazyModule('micronap.sdk')
+
 
-def create_macro_def(k, id_bytes, num_counters):
+def create_macro_def(k, id_bytes, num_counters, anml_path=settings.ANML_PATH):
     """"""
     macro = ItemsetMacro(ap.Anml(), k, id_bytes, num_counters)
     macro.compile()
-    macro.export('i{}c{}k{}.anml'.format(id_bytes, num_counters, k))
+    macro.export('i{}c{}k{}.anml'.format(id_bytes, num_counters, k), path=anml_path)
 
-def create_network(ick):
+def create_network(ick, anml_path=settings.ANML_PATH):
     """"""
     anml = ap.Anml()
-    mdef = anml.LoadAnmlMacro(os.path.join(settings.ANML_PATH, '{}.anml'.format(ick)))
+    mdef = anml.LoadAnmlMacro(os.path.join(anml_path, '{}.anml'.format(ick)))
     network = anml.CreateAutomataNetwork(anmlId='arm_net_{}'.format(ick))
     return anml, mdef, network
 
@@ -30,37 +34,54 @@ def get_load_size(fsm):
     except ap.ApError:
         return float('inf')
 
-def compile_automaton(k, id_bytes, num_counters, verbose=False):
-    """"""
+def compile_automaton(k, id_bytes, num_counters, verbose=False, anml_path=settings.ANML_PATH,
+                      fsm_path=settings.FSM_PATH, map_path=settings.MAP_PATH, db=None):
+    """Compiles as many macro references as fit in one rank and saves the FSM.
+
+    The macro count is found with capacity.search_capacity, starting from an
+    estimate based on the blocks used per macro at smaller counts. Every
+    compile is recorded in the capacity database, so later builds of the
+    same automaton start from what is already known.
+    """
     ick = 'i{}c{}k{}'.format(id_bytes, num_counters, k)
-    count = 1
-    exp = 0
-    block_size = 0
-    elapsed = 0
+    db = db or capacity.CapacityDB()
+    best = {}
     t0 = time.time()
-    while block_size != settings.BLK_PER_RANK:
-        anml, mdef, net = create_network(ick)
+
+    def fits_count(count):
+        anml, mdef, net = create_network(ick, anml_path)
         mrefs = []
         for i in xrange(count):
             mrefs.append(net.AddMacroRef(mdef, anmlId='mref{}'.format(i)))
         fsm, emap = anml.CompileAnml(options=ap.CompileDefs.AP_OPT_MT)
 
         block_size = fsm.GetInfo().blocks_rect
+        load_size = get_load_size(fsm)
+        db.record(ick, count, block_size, load_size)
         if verbose: print 'count={}, blocks={}, time={:.2f}'.format(count, block_size, time.time() - t0)
 
-        if block_size > settings.BLK_PER_RANK or get_load_size(fsm) > 8:
-            count -= 2**(exp-1) - 1
-            exp = 1
-        elif elapsed < settings.COMPILE_TIMEOUT:
-            count += 2**exp
-            exp += 1
-        else:
-            break
-        elapsed = time.time() - t0
-
-    fsm = label_automaton(k, id_bytes, mdef, mrefs, fsm, emap)
-    save_automaton(fsm, emap, ick)
-    return fsm, emap
+        if not capacity.fits(block_size, load_size):
+            return False
+        if count > best.get('count', 0):
+            best.update(count=count, mdef=mdef, mrefs=mrefs, fsm=fsm, emap=emap)
+        return True
+
+    guess = db.estimate(ick)
+    if guess is None:
+        fits_count(1)
+        guess = db.estimate(ick) or 1
+    lo, hi = db.bounds(ick)
+    count = capacity.search_capacity(fits_count, lo, hi, guess, deadline=t0 + settings.COMPILE_TIMEOUT)
+
+    # The count may be known from earlier builds without compiling it here
+    if count and best.get('count') != count and not fits_count(count):
+        count = best.get('count', 0)
+    if not count:
+        raise RuntimeError('{}: no macro reference fits in a rank'.format(ick))
+
+    fsm = label_automaton(k, id_bytes, best['mdef'], best['mrefs'], best['fsm'], best['emap'])
+    save_automaton(fsm, best['emap'], ick, fsm_path, map_path)
+    return fsm, best['emap']
 
 def label_automaton(k, id_bytes, mdef, mrefs, fsm, emap):
     changes = []
@@ -72,10 +93,92 @@ def label_automaton(k, id_bytes, mdef, mrefs, fsm, emap):
     fsm.SetSymbol(emap, changes)
     return fsm
 
-def save_automaton(fsm, emap, ick):
+def save_automaton(fsm, emap, ick, fsm_path=settings.FSM_PATH, map_path=settings.MAP_PATH):
     """"""
-    fsm.Save(os.path.join(settings.FSM_PATH, '{}.fsm'.format(ick)))
-    emap.SaveElementMap(os.path.join(settings.MAP_PATH, '{}.map'.format(ick)))
+    fsm.Save(os.path.join(fsm_path, '{}.fsm'.format(ick)))
+    emap.SaveElementMap(os.path.join(map_path, '{}.map'.format(ick)))
+
+def build_automaton(k, id_bytes, num_counters, verbose=False, union=True, cache_path=settings.AUTOMATA_CACHE_PATH):
+    """Compiles one automaton into the automata cache ARM loads from.
+
+    The cache compiles into a scratch directory and renames it into place,
+    so concurrent builds never expose partially written files. With union
+    set, the x8 union FSM is built with apadmin into the same entry.
+
+    Returns:
+        The artifact paths, as returned by AutomataCache.get.
+    """
+    # Imported here since the cache compiles through this module
+    from cache import AutomataCache
+
+    paths = AutomataCache(cache_path, verbose=verbose).get(k, id_bytes, num_counters)
+    union_fsm = '{}x8.fsm'.format(os.path.splitext(paths['fsm'])[0])
+    if union and not os.path.isfile(union_fsm):
+        tmp = '{}.tmp-{}'.format(union_fsm, os.getpid())
+        try:
+            subprocess.check_call(['apadmin', '--output={}'.format(tmp), '--union'] + [paths['fsm']] * 8)
+            os.rename(tmp, union_fsm)
+        finally:
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+    return paths
+
+def run_build_job(k, id_bytes, num_counters, verbose, union, cache_path, log_path):
+    """Process entry point for build_automaton, logging to log_path."""
+    with open(log_path, 'w') as log:
+        os.dup2(log.fileno(), sys.stdout.fileno())
+        os.dup2(log.fileno(), sys.stderr.fileno())
+        build_automaton(k, id_bytes, num_counters, verbose, union, cache_path)
+
+def build_all(jobs, num_procs, timeout=settings.COMPILE_JOB_TIMEOUT, verbose=False, union=True,
+              cache_path=settings.AUTOMATA_CACHE_PATH):
+    """Builds (k, id_bytes, num_counters) jobs into the automata cache on up
+    to num_procs processes.
+
+    Each job runs in its own process with its output in <cache_path>/<ick>.log,
+    and is killed if it runs for longer than timeout seconds.
+
+    Returns:
+        A list of the ick names of the jobs that failed or timed out.
+    """
+    if not os.path.isdir(cache_path):
+        os.makedirs(cache_path)
+
+    pending = list(jobs)
+    total = len(pending)
+    running = {}
+    failed = []
+    done = 0
+    while pending or running:
+        while pending and len(running) < num_procs:
+            k, id_bytes, num_counters = pending.pop(0)
+            ick = 'i{}c{}k{}'.format(id_bytes, num_counters, k)
+            log_path = os.path.join(cache_path, '{}.log'.format(ick))
+            proc = multiprocessing.Process(target=run_build_job,
+                                           args=(k, id_bytes, num_counters, verbose, union, cache_path, log_path))
+            proc.start()
+            running[ick] = (proc, time.time())
+
+        time.sleep(0.5)
+        for ick, (proc, t0) in running.items():
+            elapsed = time.time() - t0
+            if proc.is_alive():
+                if elapsed < timeout:
+                    continue
+                proc.terminate()
+                proc.join()
+                status = 'timed out'
+            else:
+                status = 'ok' if proc.exitcode == 0 else 'failed ({})'.format(proc.exitcode)
+
+            del running[ick]
+            done += 1
+            if status != 'ok':
+                failed.append(ick)
+            print '[{}/{}] {} {} after {:.0f}s'.format(done, total, ick, status, elapsed)
+            sys.stdout.flush()
+
+    return failed
 
 def main():
     """"""
@@ -84,6 +187,10 @@ def main():
     parser = ArgumentParser()
     parser.add_argument('--max-k', '-k', type=int, required=True)
     parser.add_argument('--device', '-d', default=settings.DEV_NAME)
+    parser.add_argument('--jobs', '-j', type=int, default=multiprocessing.cpu_count(), help='Number of parallel compile processes')
+    parser.add_argument('--timeout', '-t', type=int, default=settings.COMPILE_JOB_TIMEOUT, help='Seconds before a compile job is killed')
+    parser.add_argument('--cache', default=settings.AUTOMATA_CACHE_PATH, help='Automata cache directory to fill')
+    parser.add_argument('--no-union', dest='union', action='store_false', default=True, help='Skip building the x8 union FSMs')
     parser.add_argument('--verbose', '-v', action='store_true', default=False)
     args = parser.parse_args()
 
@@ -92,12 +199,16 @@ def main():
     # - number of counters
     # - max itemset size (k)
     # 
+    jobs = []
     for id_bytes in xrange(1, 3):
         for num_counters in xrange(1, 4):
             for k in xrange(2, args.max_k + 1):
-                print 'Compiling FSM for i{}c{}k{}'.format(id_bytes, num_counters, k)
-                create_macro_def(k, id_bytes, num_counters)
-                fsm, _ = compile_automaton(k, id_bytes, num_counters, args.verbose)
+                jobs.append((k, id_bytes, num_counters))
+
+    print 'Compiling {} FSMs on {} processes'.format(len(jobs), args.jobs)
+    failed = build_all(jobs, args.jobs, args.timeout, args.verbose, args.union, args.cache)
+    if failed:
+        sys.exit('{}: failed to build {}'.format(__file__, ', '.join(sorted(failed))))
 
 
 if __name__ == '__main__':
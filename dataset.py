@@ -1,6 +1,9 @@
+import itertools
 import math
+import mmap
 import os
-import struct
+
+import numpy as np
 
 import settings
 import utils
@@ -13,8 +16,26 @@ class Dataset(object):
 
         self.datafile = datafile
         self.data = []
-        self.encoded_data = ''
+        self.encoded_data = bytearray()
         self.num_id_bytes = 0
+        self.num_transactions = 0
+
+        # Compact representation built by parse_file_streaming
+        self.item_array = None
+        self.txn_offsets = None
+        self.item_counts = None
+
+        # Original ID of each dense item ID, set by remap_items
+        self.item_ids = None
+
+        # Transactions left by the last reduce_level call
+        self.level_k = None
+        self.level_items = None
+        self.level_lengths = None
+        self.level_data = None
+
+        # Last reduction computed by reduce_, keyed by its arguments
+        self.reduced = None
 
     def parse_file(self):
         """"""
@@ -26,8 +47,90 @@ class Dataset(object):
                 max_id = max(max_id, max(items))
                 self.data.append(items)
                 line = fh.readline()
+        self.num_transactions = len(self.data)
         self.calc_num_id_bytes_(max_id)
 
+    def parse_file_streaming(self, block_size=settings.PARSE_BLOCK_SZ):
+        """Parses the file into flat arrays instead of a list of lists.
+
+        The file is memory-mapped and tokenized block_size bytes at a time.
+        Items end up in item_array (int32), with transaction i stored in
+        item_array[txn_offsets[i]:txn_offsets[i + 1]]. Item counts and the
+        maximum item ID are collected in the same pass. Blank lines are
+        skipped.
+        """
+        items = []
+        lengths = []
+        counts = np.zeros(0, dtype=np.int64)
+
+        with open(self.datafile, 'rb') as fh:
+            size = os.fstat(fh.fileno()).st_size
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else ''
+            pos = 0
+            while pos < size:
+                end = min(pos + block_size, size)
+                # Only tokenize whole lines, growing the block for long ones
+                while end < size:
+                    nl = mm.rfind('\n', pos, end)
+                    if nl >= 0:
+                        end = nl + 1
+                        break
+                    end = min(end + block_size, size)
+
+                block_items, block_lengths = self.tokenize_block_(mm[pos:end])
+                items.append(block_items)
+                lengths.append(block_lengths)
+                if len(block_items):
+                    block_counts = np.bincount(block_items)
+                    if len(block_counts) > len(counts):
+                        counts = np.concatenate([counts, np.zeros(len(block_counts) - len(counts), dtype=np.int64)])
+                    counts[:len(block_counts)] += block_counts
+                pos = end
+            if size:
+                mm.close()
+
+        self.item_array = np.concatenate(items) if items else np.zeros(0, dtype=np.int32)
+        lengths = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int64)
+        self.txn_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.txn_offsets[1:])
+        self.item_counts = counts
+        self.num_transactions = len(lengths)
+        self.calc_num_id_bytes_(len(counts) - 1)
+
+    def tokenize_block_(self, block):
+        """Returns the items and per-line item counts of a block of whole lines."""
+        buf = np.frombuffer(block, dtype=np.uint8)
+        digit = (buf >= ord('0')) & (buf <= ord('9'))
+        if not digit.any():
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+
+        prev_digit = np.concatenate([[False], digit[:-1]])
+        next_digit = np.concatenate([digit[1:], [False]])
+        starts = np.flatnonzero(digit & ~prev_digit)
+        ends = np.flatnonzero(digit & ~next_digit)
+
+        # Weight every digit by its place value within its token
+        positions = np.flatnonzero(digit)
+        token = np.cumsum(digit & ~prev_digit)[positions] - 1
+        place = 10.0 ** (ends[token] - positions)
+        values = np.bincount(token, weights=(buf[positions] - ord('0')) * place)
+        values = np.rint(values).astype(np.int32)
+
+        # Line of each token, dropping lines without any items
+        lines = np.cumsum(buf == ord('\n'))[starts]
+        lengths = np.bincount(lines)
+        return values, lengths[lengths > 0]
+
+    def iter_transactions(self):
+        """Yields each transaction as a list of items, whichever way it was parsed."""
+        if self.item_array is None:
+            for row in self.data:
+                yield row
+        else:
+            offsets = self.txn_offsets.tolist()
+            for i in xrange(self.num_transactions):
+                yield self.item_array[offsets[i]:offsets[i + 1]].tolist()
+
     def calc_num_id_bytes_(self, max_id):
         """"""
         try:
@@ -35,8 +138,119 @@ class Dataset(object):
         except ValueError:
             pass
 
+    def remap_items(self, threshold):
+        """Renumbers the frequent items densely, most frequent first.
+
+        The most frequent item becomes 0, the next 1 and so on, and infrequent
+        items are dropped from every transaction (empty transactions are kept,
+        so num_transactions does not change). Each transaction is re-sorted by
+        its new IDs, which the itemset macros depend on. Unless more than
+        STE_ID_SPACE items are frequent, the stream then needs one byte per
+        item. The result replaces the parsed transactions, in the compact form
+        of parse_file_streaming; original_itemset translates results back.
+
+        Args:
+            threshold: Minimum support of the items to keep.
+        """
+        flat, lengths = self.flat_transactions_()
+        counts = self.item_counts
+        if counts is None:
+            counts = np.bincount(flat) if len(flat) else np.zeros(0, dtype=np.int64)
+
+        frequent = np.flatnonzero(counts >= max(threshold, 1))
+        order = np.lexsort((frequent, -counts[frequent]))
+        self.item_ids = frequent[order]
+        dense = np.full(len(counts), -1, dtype=np.int64)
+        dense[self.item_ids] = np.arange(len(self.item_ids))
+
+        txns = np.repeat(np.arange(len(lengths)), lengths)
+        items = dense[flat]
+        keep = items >= 0
+        items, txns = items[keep], txns[keep]
+        order = np.lexsort((items, txns))
+
+        self.data = []
+        self.item_array = items[order].astype(np.int32)
+        self.txn_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(txns, minlength=len(lengths)), out=self.txn_offsets[1:])
+        self.item_counts = counts[self.item_ids]
+        self.num_id_bytes = max(1, len(utils.to_base(max(len(self.item_ids) - 1, 0), settings.STE_ID_SPACE)))
+        self.level_k = None
+        self.reduced = None
+
+    def original_itemset(self, itemset):
+        """Returns itemset with its items translated back to the IDs in the file."""
+        if self.item_ids is None:
+            return frozenset(itemset)
+        return frozenset(int(self.item_ids[x]) for x in itemset)
+
+    def sample(self, fraction, seed=None):
+        """Returns a Dataset of a random sample of the transactions.
+
+        Each transaction is kept with probability fraction. The sample is held
+        in the compact form of parse_file_streaming, with its own item counts,
+        and shares the item IDs of this dataset.
+        """
+        flat, lengths = self.flat_transactions_()
+        keep = np.random.RandomState(seed).random_sample(len(lengths)) < fraction
+        items = flat[np.repeat(keep, lengths)]
+
+        sample = Dataset(self.datafile)
+        sample.item_array = items.astype(np.int32)
+        sample.txn_offsets = np.zeros(int(keep.sum()) + 1, dtype=np.int64)
+        np.cumsum(lengths[keep], out=sample.txn_offsets[1:])
+        sample.item_counts = np.bincount(items) if len(items) else np.zeros(0, dtype=np.int64)
+        sample.num_transactions = int(keep.sum())
+        sample.num_id_bytes = self.num_id_bytes
+        sample.item_ids = self.item_ids
+        return sample
+
+    def save_arrays(self, path):
+        """Saves the parsed transactions and the encoded stream to path (.npz).
+
+        load_arrays restores them without parsing or encoding the file again.
+        The file is written atomically.
+        """
+        items, lengths = self.flat_transactions_()
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        counts = self.item_counts
+        if counts is None:
+            counts = np.bincount(items) if len(items) else np.zeros(0, dtype=np.int64)
+
+        arrays = {
+            'item_array': items.astype(np.int32),
+            'txn_offsets': offsets,
+            'item_counts': counts,
+            'encoded_data': np.frombuffer(self.encoded_data, dtype=np.uint8),
+            'num_id_bytes': np.array(self.num_id_bytes),
+        }
+        if self.item_ids is not None:
+            arrays['item_ids'] = self.item_ids
+        tmp = '{}.tmp{}'.format(path, os.getpid())
+        with open(tmp, 'wb') as fh:
+            np.savez(fh, **arrays)
+        os.rename(tmp, path)
+
+    def load_arrays(self, path):
+        """Restores the state written by save_arrays instead of parsing the file."""
+        arrays = np.load(path)
+        self.data = []
+        self.item_array = arrays['item_array']
+        self.txn_offsets = arrays['txn_offsets']
+        self.item_counts = arrays['item_counts']
+        self.encoded_data = bytearray(arrays['encoded_data'].tostring())
+        self.num_id_bytes = int(arrays['num_id_bytes'])
+        self.item_ids = arrays['item_ids'] if 'item_ids' in arrays.files else None
+        self.num_transactions = len(self.txn_offsets) - 1
+        self.level_k = None
+        self.reduced = None
+
     def get_frequent_items(self, threshold):
         """"""
+        if self.item_counts is not None:
+            return np.flatnonzero(self.item_counts >= max(threshold, 1)).tolist()
+
         freq = {}
         for row in self.data:
             for item in row:
@@ -48,28 +262,111 @@ class Dataset(object):
         return [x for x in freq.keys() if freq[x] >= threshold]
 
     def encode_data(self):
-        """"""
-        data = []
-        for row in self.data:
-            # Add the leading transaction delimiter
-            data.append(struct.pack('B', settings.DEFAULT_DELIM))
-            for item in row:
-                id_bytes = utils.to_base(item, settings.STE_ID_SPACE)
+        """Encodes the transactions as one stream of base-255 item IDs.
+
+        Each transaction starts with a DEFAULT_DELIM byte, and every item is
+        written big-endian and zero-padded to num_id_bytes. The stream ends
+        with three delimiters. All items are converted at once and written
+        into a single preallocated buffer.
+        """
+        self.encoded_data = self.encode_(*self.flat_transactions_())
+
+    def reduce_level(self, k, items):
+        """Encodes only the part of the transactions that can hold a k-candidate.
+
+        Items not in items are dropped, and so are transactions left with
+        fewer than k items. Each level starts from the previous level's
+        reduced transactions, so the work shrinks along with the stream.
+        Going back to a lower k starts over from all transactions.
+
+        Args:
+            k: Number of items in each candidate.
+            items: Every item appearing in a k-candidate.
+
+        Returns:
+            The reduced stream, encoded like encode_data; also kept in
+            level_data.
+        """
+        self.level_items, self.level_lengths = self.reduce_(k, items)
+        self.level_k = k
+        self.level_data = self.encode_(self.level_items, self.level_lengths)
+        return self.level_data
+
+    def reduced_length(self, k, items):
+        """Returns the length of the stream reduce_level(k, items) would
+        encode, without encoding it."""
+        flat, lengths = self.reduce_(k, items)
+        widths = self.item_widths_(flat)[1]
+        return len(lengths) + int(widths.sum()) + 3
+
+    def reduce_(self, k, items):
+        """Returns the items and transaction lengths reduce_level keeps.
+
+        The last result is cached, so a reduced_length followed by the
+        reduce_level of the same level filters the transactions once.
+        """
+        key = (self.level_k, k, frozenset(items))
+        if self.reduced is not None and self.reduced[0] == key:
+            return self.reduced[1]
+
+        if self.level_k is None or k <= self.level_k:
+            flat, lengths = self.flat_transactions_()
+        else:
+            flat, lengths = self.level_items, self.level_lengths
+
+        txns = np.repeat(np.arange(len(lengths)), lengths)
+        keep = np.in1d(flat, np.fromiter(key[2], dtype=np.int64))
+        kept_lengths = np.bincount(txns[keep], minlength=len(lengths))
+        long_enough = kept_lengths >= k
+        keep &= long_enough[txns]
+
+        self.reduced = (key, (flat[keep], kept_lengths[long_enough]))
+        return self.reduced[1]
+
+    def item_widths_(self, items):
+        """Returns the digits of each item (zero needs none) and the bytes written for it."""
+        num_digits = np.zeros(len(items), dtype=np.int64)
+        power = 1
+        while len(items) and power <= items.max():
+            num_digits += items >= power
+            power *= settings.STE_ID_SPACE
+        return num_digits, np.maximum(num_digits, self.num_id_bytes)
+
+    def encode_(self, items, lengths):
+        """Returns items, split into transactions of the given lengths, as a stream."""
+        base = settings.STE_ID_SPACE
+
+        num_digits, widths = self.item_widths_(items)
+
+        # A transaction starts after all earlier items and delimiters; an item
+        # ends after all items up to itself plus its own transaction delimiter
+        width_ends = np.cumsum(widths)
+        item_offsets = np.cumsum(lengths) - lengths
+        row_starts = np.concatenate([[0], width_ends])[item_offsets] + np.arange(len(lengths))
+        item_ends = width_ends + np.repeat(np.arange(len(lengths)), lengths) + 1
 
-                # Prepend any leading ID zeroes
-                for _ in xrange(self.num_id_bytes - len(id_bytes)):
-                    data.append(struct.pack('B', 0))
+        size = len(lengths) + int(widths.sum()) + 3
+        data = bytearray(size)
+        buf = np.frombuffer(data, dtype=np.uint8)
+        buf[row_starts] = settings.DEFAULT_DELIM
+        buf[-3:] = settings.DEFAULT_DELIM
 
-                # Add the ID bytes
-                for i in id_bytes: 
-                    data.append(struct.pack('B', i))
+        # Fill in digits from least significant, leaving leading zeroes
+        remaining = items.copy()
+        for j in xrange(int(num_digits.max()) if len(items) else 0):
+            has_digit = num_digits > j
+            buf[(item_ends - 1 - j)[has_digit]] = remaining[has_digit] % base
+            remaining //= base
 
-        # Add the end-of-data delimiters
-        data.append(struct.pack('B', settings.DEFAULT_DELIM))
-        data.append(struct.pack('B', settings.DEFAULT_DELIM))
-        data.append(struct.pack('B', settings.DEFAULT_DELIM))
+        return data
 
-        self.encoded_data = ''.join(data)
+    def flat_transactions_(self):
+        """Returns all items as one int64 array, plus the length of each transaction."""
+        if self.item_array is not None:
+            return self.item_array.astype(np.int64), np.diff(self.txn_offsets)
 
+        lengths = np.array([len(row) for row in self.data], dtype=np.int64)
+        items = np.fromiter(itertools.chain.from_iterable(self.data), dtype=np.int64, count=int(lengths.sum()))
+        return items, lengths
 
 # vim: nu:et:ts=4:sw=4:fdm=indent
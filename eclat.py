@@ -0,0 +1,127 @@
+import multiprocessing
+
+import numpy as np
+
+from fpgrowth import FPGrowthARM
+import settings
+
+# Members of the top-level equivalence classes, set before the worker pool
+# is forked so every worker shares the tid-lists instead of unpickling them
+_members = None
+_min_support = None
+_max_k = None
+
+
+def eclat(prefix, members, min_support, max_k, diff, results):
+    """Mines the equivalence class of prefix depth first.
+
+    Each member is an (item, tids, support) triple, where tids are the sorted
+    transaction IDs holding prefix + (item,) or, if diff, the diffset: the
+    IDs holding prefix but not the item.
+
+    Args:
+        prefix: Tuple of the items shared by the class.
+        members: List of (item, tids, support) triples.
+        min_support: Minimum support as an absolute number of transactions.
+        max_k: Largest itemsets to mine.
+        diff: Whether the members hold diffsets instead of tid-lists.
+        results: List receiving an (itemset tuple, support) pair per itemset.
+    """
+    for i in xrange(len(members)):
+        extend(prefix, members, i, min_support, max_k, diff, results)
+
+def extend(prefix, members, i, min_support, max_k, diff, results):
+    """Mines the itemsets starting with prefix and the i-th member; see eclat.
+
+    The child class starts out as diffsets and falls back to tid-lists
+    while those are smaller. The diffsets of a diffset class only shrink,
+    so it keeps them.
+    """
+    x, tx, sx = members[i]
+    itemset = prefix + (x,)
+    results.append((itemset, sx))
+    if len(itemset) >= max_k:
+        return
+
+    children = []
+    for y, ty, _ in members[i + 1:]:
+        if diff:
+            d = np.setdiff1d(ty, tx, assume_unique=True)
+        else:
+            d = np.setdiff1d(tx, ty, assume_unique=True)
+        if sx - len(d) >= min_support:
+            children.append((y, d, sx - len(d)))
+
+    child_diff = True
+    if not diff and sum(len(d) for _, d, _ in children) > sum(s for _, _, s in children):
+        children = [(y, np.setdiff1d(tx, d, assume_unique=True), s) for y, d, s in children]
+        child_diff = False
+    if children:
+        eclat(itemset, children, min_support, max_k, child_diff, results)
+
+def mine_class_(i):
+    """Mines the top-level class of the i-th item (worker entry point)."""
+    results = []
+    extend((), _members, i, _min_support, _max_k, False, results)
+    return results
+
+
+class EclatARM(FPGrowthARM):
+    """Eclat support counting with the same interface as ARM.
+
+    Like FPGrowthARM, every level is mined depth first by the first
+    execute_iteration. Each frequent item's tid-list is a sorted int32
+    array, and the class of each item (its itemsets with the later,
+    more frequent items) is mined in a process pool.
+    """
+    def __init__(self, initial_items, min_support, transactions, max_k, processes=settings.ECLAT_PROCESSES, observer=None):
+        """Constructor.
+
+        Args:
+            processes: Worker processes; None for one per CPU, 1 to mine
+                       in this process.
+
+        See FPGrowthARM for the other arguments.
+        """
+        FPGrowthARM.__init__(self, initial_items, min_support, transactions, max_k, observer)
+        self.processes = processes
+
+    def tidlists_(self):
+        """Returns an (item, tids, support) triple per frequent item, least frequent first."""
+        tids = dict((x, []) for x in self.items)
+        for tid, (row, _) in enumerate(self.transactions):
+            for x in row:
+                tids[x].append(tid)
+
+        min_support = max(self.min_support, 1)
+        members = [(x, np.array(t, dtype=np.int32), len(t)) for x, t in tids.iteritems() if len(t) >= min_support]
+        return sorted(members, key=lambda m: (m[2], m[0]))
+
+    def mine_(self):
+        """"""
+        global _members, _min_support, _max_k
+
+        _members = self.tidlists_()
+        _min_support = max(self.min_support, 1)
+        _max_k = self.max_k
+        try:
+            if self.processes == 1 or len(_members) < 2:
+                batches = [mine_class_(i) for i in xrange(len(_members))]
+            else:
+                pool = multiprocessing.Pool(self.processes)
+                try:
+                    batches = pool.map(mine_class_, xrange(len(_members)), chunksize=1)
+                finally:
+                    pool.close()
+                    pool.join()
+        finally:
+            _members = None
+
+        supports = {}
+        for batch in batches:
+            for itemset, support in batch:
+                supports[frozenset(itemset)] = support
+        return supports
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
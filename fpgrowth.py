@@ -0,0 +1,168 @@
+import array
+
+from stats import Observer
+
+
+class FPTree(object):
+    """Prefix tree of weighted transactions, stored as parallel arrays.
+
+    Node 0 is the root. Node i holds item[i], count[i] and the index of its
+    parent; links[x] lists every node of item x. Items are inserted in
+    descending order of support, given as rank (lower is more frequent), so
+    common prefixes are shared.
+    """
+    def __init__(self, rank):
+        self.rank = rank
+        self.parent = array.array('l', [-1])
+        self.item = array.array('l', [-1])
+        self.count = array.array('l', [0])
+        self.links = {}
+        self.children = {}
+
+    def insert(self, items, weight):
+        """Adds one transaction, whose items must all appear in rank."""
+        node = 0
+        for x in sorted(items, key=self.rank.__getitem__):
+            child = self.children.get((node, x))
+            if child is None:
+                child = len(self.item)
+                self.children[(node, x)] = child
+                self.parent.append(node)
+                self.item.append(x)
+                self.count.append(0)
+                self.links.setdefault(x, array.array('l')).append(child)
+            self.count[child] += weight
+            node = child
+
+    def support(self, x):
+        """"""
+        count = self.count
+        return sum(count[n] for n in self.links.get(x, []))
+
+    def prefix_paths(self, x):
+        """Yields the items above each node of x, with the node's count."""
+        parent, item = self.parent, self.item
+        for n in self.links.get(x, []):
+            path = []
+            p = parent[n]
+            while p > 0:
+                path.append(item[p])
+                p = parent[p]
+            yield path, self.count[n]
+
+
+def build_tree(transactions, min_support):
+    """Builds an FPTree of the items with at least min_support occurrences.
+
+    Args:
+        transactions: List of (items, weight) pairs.
+        min_support: Minimum support as an absolute number of transactions.
+    """
+    supports = {}
+    for items, weight in transactions:
+        for x in items:
+            supports[x] = supports.get(x, 0) + weight
+
+    frequent = sorted((x for x, s in supports.iteritems() if s >= min_support), key=lambda x: (-supports[x], x))
+    tree = FPTree(dict((x, i) for i, x in enumerate(frequent)))
+    for items, weight in transactions:
+        items = [x for x in items if x in tree.rank]
+        if items:
+            tree.insert(items, weight)
+    tree.children = None
+    return tree
+
+def fpgrowth(tree, min_support, max_k, suffix=(), results=None):
+    """Mines every frequent itemset of up to max_k items from tree.
+
+    Returns:
+        A dict mapping each frequent itemset (frozenset) to its support.
+    """
+    if results is None:
+        results = {}
+
+    # Least frequent items first, so their conditional trees are smallest
+    for x in sorted(tree.rank, key=tree.rank.__getitem__, reverse=True):
+        support = tree.support(x)
+        if support < min_support:
+            continue
+        itemset = suffix + (x,)
+        results[frozenset(itemset)] = support
+        if len(itemset) < max_k:
+            conditional = build_tree(list(tree.prefix_paths(x)), min_support)
+            if conditional.rank:
+                fpgrowth(conditional, min_support, max_k, itemset, results)
+    return results
+
+
+class FPGrowthARM(object):
+    """FP-Growth support counting with the same interface as ARM.
+
+    FP-Growth is depth first, so every level up to max_k is mined by the
+    first execute_iteration. Later iterations, and the levels attribute,
+    then hand out one level at a time like the level-wise engines.
+    """
+    def __init__(self, initial_items, min_support, transactions, max_k, observer=None):
+        """Constructor.
+
+        Args:
+            initial_items: Frequent 1-items, as returned by get_frequent_items.
+            min_support: Minimum support as an absolute number of transactions.
+            transactions: Iterable of parsed transactions, e.g. from
+                          Dataset.iter_transactions.
+            max_k: Largest itemsets to mine.
+            observer: stats.Observer receiving counters and timings of each
+                      iteration.
+        """
+        self.min_support = min_support
+        self.max_k = max_k
+        self.observer = observer or Observer()
+        self.items = set(initial_items)
+        self.itemsets = set([frozenset([x]) for x in self.items])
+        self.levels = {1: set(self.itemsets)}
+        self.supports = {}
+        self.mined = None
+
+        self.k = None
+        self.candidates = []
+
+        items = self.items
+        self.transactions = [([x for x in row if x in items], 1) for row in transactions]
+        for row, _ in self.transactions:
+            for x in row:
+                itemset = frozenset([x])
+                self.supports[itemset] = self.supports.get(itemset, 0) + 1
+
+    def init_iteration(self, k):
+        """"""
+        self.k = k
+        self.observer.begin_iteration(k)
+
+    def execute_iteration(self, data=None):
+        """Adds the frequent k-itemsets, mining every level on the first call.
+
+        Args:
+            data: Unused; the transactions are already held in memory.
+        """
+        if self.mined is None:
+            with self.observer.timer('scan'):
+                supports = self.mine_()
+            self.transactions = None
+            self.supports.update(supports)
+            self.mined = {}
+            for itemset in supports:
+                self.mined.setdefault(len(itemset), set()).add(itemset)
+
+        self.levels[self.k] = self.mined.get(self.k, set())
+        for itemset in self.levels[self.k]:
+            self.items.update(itemset)
+        self.itemsets |= self.levels[self.k]
+        self.observer.count('frequent', len(self.levels[self.k]))
+
+    def mine_(self):
+        """Returns the support of every frequent itemset of up to max_k items."""
+        tree = build_tree(self.transactions, max(self.min_support, 1))
+        return fpgrowth(tree, max(self.min_support, 1), self.max_k)
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+from argparse import ArgumentParser
+import json
+import os
+import sys
+
+from bitmap import BitmapARM
+from dataset import Dataset
+from sink import FORMATS, open_sink
+import utils
+
+
+class IncrementalMiner(object):
+    """Keeps the frequent itemsets of a growing dataset up to date (FUP).
+
+    The state holds the exact support of every frequent itemset and of the
+    itemsets of the negative border (candidates that were counted and found
+    infrequent). When transactions are appended, each level's candidates
+    are counted in the new transactions only. A candidate that was counted
+    before gets its new support by adding the delta count. An itemset that
+    was never frequent had at most threshold - 1 occurrences in the old
+    data, so it can only become frequent if the delta alone holds enough
+    occurrences to make up the difference; only those candidates are counted
+    in the old data. Every item's support is kept, so level 1 never needs
+    the old data.
+    """
+    def __init__(self, min_support, max_k, path=None):
+        """Constructor.
+
+        Args:
+            min_support: Minimum support as an exact value (n) or a percentage
+                         (n%) of all transactions seen so far.
+            max_k: Largest itemsets to mine.
+            path: JSON file holding the state between runs.
+        """
+        self.min_support = min_support
+        self.max_k = max_k
+        self.path = path
+        self.num_transactions = 0
+        self.files = []
+        self.frequent = {}
+        self.border = {}
+        self.levels = {}
+        self.rescanned = 0
+
+    @classmethod
+    def load(cls, path):
+        """Returns the miner saved at path."""
+        with open(path) as fh:
+            state = json.load(fh)
+        miner = cls(state['min_support'], state['max_k'], path)
+        miner.num_transactions = state['num_transactions']
+        miner.files = state['files']
+        miner.frequent = dict((frozenset(x), s) for x, s in state['frequent'])
+        miner.border = dict((frozenset(x), s) for x, s in state['border'])
+        for itemset in miner.frequent:
+            miner.levels.setdefault(len(itemset), set()).add(itemset)
+        return miner
+
+    def save(self, path=None):
+        """Writes the state to path (default the path it was loaded from) atomically."""
+        self.path = path or self.path
+        state = {
+            'min_support': self.min_support,
+            'max_k': self.max_k,
+            'num_transactions': self.num_transactions,
+            'files': self.files,
+            'frequent': [[sorted(x), s] for x, s in self.frequent.iteritems()],
+            'border': [[sorted(x), s] for x, s in self.border.iteritems()],
+        }
+        utils.atomic_write(self.path, json.dumps(state))
+
+    def update(self, delta_file):
+        """Adds the transactions of delta_file and updates every level.
+
+        The first update of an empty miner mines delta_file from scratch.
+        """
+        delta = Dataset(delta_file)
+        delta.parse_file_streaming()
+
+        old_total = self.num_transactions
+        new_total = old_total + delta.num_transactions
+        new_threshold = max(utils.normalize_minsup(self.min_support, new_total), 1)
+        # Fewest delta occurrences that can make a never frequent itemset frequent
+        min_delta = 0
+        if old_total:
+            min_delta = new_threshold - max(utils.normalize_minsup(self.min_support, old_total), 1) + 1
+
+        known = dict(self.frequent)
+        known.update(self.border)
+        self.frequent = {}
+        self.border = {}
+        self.levels = {}
+        self.rescanned = 0
+
+        # Level 1: the support of every item is known, so just add the delta
+        supports = dict((x, s) for x, s in known.iteritems() if len(x) == 1)
+        for item in delta.get_frequent_items(1):
+            itemset = frozenset([item])
+            supports[itemset] = supports.get(itemset, 0) + int(delta.item_counts[item])
+        self.add_level_(1, supports, new_threshold)
+        self.border.update((x, s) for x, s in supports.iteritems() if s < new_threshold)
+
+        items = [x for itemset in self.levels[1] for x in itemset]
+        delta_counter = BitmapARM(items, new_threshold, delta.iter_transactions())
+        old_counter = None
+
+        for k in xrange(2, self.max_k + 1):
+            candidates = utils.apriori_gen(self.levels[k - 1], k)
+            if not candidates:
+                break
+
+            supports = {}
+            rescan = []
+            for itemset, count in zip(candidates, delta_counter.count_support_(candidates)):
+                itemset = frozenset(itemset)
+                if itemset in known:
+                    supports[itemset] = known[itemset] + int(count)
+                elif not old_total:
+                    supports[itemset] = int(count)
+                elif count >= min_delta:
+                    rescan.append((itemset, int(count)))
+
+            if rescan:
+                if old_counter is None:
+                    old_counter = BitmapARM(items, new_threshold, self.old_transactions_())
+                counts = old_counter.count_support_([sorted(x) for x, _ in rescan])
+                for (itemset, count), old_count in zip(rescan, counts):
+                    supports[itemset] = int(old_count) + count
+                self.rescanned += len(rescan)
+
+            self.add_level_(k, supports, new_threshold)
+            self.border.update((x, s) for x, s in supports.iteritems() if s < new_threshold)
+            if not self.levels[k]:
+                break
+
+        self.num_transactions = new_total
+        self.files.append(os.path.abspath(delta_file))
+
+    def add_level_(self, k, supports, threshold):
+        """"""
+        self.levels[k] = set(x for x, s in supports.iteritems() if s >= threshold)
+        for itemset in self.levels[k]:
+            self.frequent[itemset] = supports[itemset]
+
+    def old_transactions_(self):
+        """Yields the transactions of every file added before the current update."""
+        for path in self.files:
+            ds = Dataset(path)
+            ds.parse_file_streaming()
+            for row in ds.iter_transactions():
+                yield row
+
+
+def parse_args():
+    """"""
+    parser = ArgumentParser(description='Mines a dataset, or adds a file of new transactions to an earlier run')
+    parser.add_argument('--state', required=True, help='File holding the frequent itemsets and negative border between runs')
+    parser.add_argument('--max-k', '-k', type=int, help='Largest itemsets to mine (first run only)')
+    parser.add_argument('--min-support', '-s', help='Minimum support threshold expressed as an exact value (n) or a percentage (n%%) (first run only)')
+    parser.add_argument('--output', '-o', help='Write every frequent itemset after the update to this file ("-" for stdout)')
+    parser.add_argument('--format', '-f', choices=FORMATS, default='text', help='Output file format')
+    parser.add_argument('--verbose', '-v', action='store_true', default=False)
+    parser.add_argument('dataset_file', help='Transactions to add')
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.state) and (args.max_k is None or args.min_support is None):
+        parser.error('the first run requires --max-k and --min-support')
+    return args
+
+def main():
+    """"""
+    args = parse_args()
+    if os.path.isfile(args.state):
+        miner = IncrementalMiner.load(args.state)
+    else:
+        miner = IncrementalMiner(args.min_support, args.max_k, args.state)
+
+    miner.update(args.dataset_file)
+    miner.save()
+    if args.verbose:
+        print >> sys.stderr, '{} transactions, {} frequent itemsets, {} itemsets in the border, {} rescanned'.format(
+            miner.num_transactions, len(miner.frequent), len(miner.border), miner.rescanned)
+
+    if args.output:
+        sink = open_sink(args.output, args.format)
+        for k in sorted(miner.levels):
+            sink.write_level(k, miner.levels[k], miner.frequent)
+        sink.close()
+
+
+if __name__ == '__main__':
+    main()
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
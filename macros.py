@@ -1,9 +1,10 @@
 import os
-import micronap.sdk as ap
 
 import settings
 import utils
 
+ap = utils.LazyModule('micronap.sdk')
+
 SYMSET_DELIM = r'[\x{:02x}]'.format(settings.DEFAULT_DELIM)
 SYMSET_NOT_DELIM = r'[^\x{:02x}]'.format(settings.DEFAULT_DELIM)
 
@@ -155,9 +156,9 @@ class ItemsetMacro(object):
         self.mdef.SetMacroDefToBeCompiled()
         self.anml.CompileMacros(options=ap.CompileDefs.AP_OPT_MT)
 
-    def export(self, filename='itemset_macro.anml'):
+    def export(self, filename='itemset_macro.anml', path=settings.ANML_PATH):
         """"""
-        self.mdef.ExportAnml(os.path.join(settings.ANML_PATH, filename))
+        self.mdef.ExportAnml(os.path.join(path, filename))
 
 
 # vim: nu:et:ts=4:sw=4:fdm=indent
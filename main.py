@@ -4,58 +4,168 @@ import itertools
 import os
 import sys
 
-import micronap.sdk as ap
-
 import settings
-from macros import ItemsetMacro
 from dataset import Dataset
 from arm import ARM
+from bitmap import BitmapARM
+from checkpoint import Checkpoint, fingerprint
+from eclat import EclatARM
+from fpgrowth import FPGrowthARM
+from planner import PlannedARM
+from sampling import SampledARM
+from sink import FORMATS, TextSink, open_sink
+from stats import Stats
 import utils
 
+ENGINES = ['automata', 'bitmap', 'fpgrowth', 'eclat', 'auto']
+
+# Engines that count from the encoded stream, at least for some levels
+STREAM_ENGINES = ['automata', 'auto']
+
+# Level-wise engines whose candidates can be pruned by --sample
+SAMPLED_ENGINES = ['automata', 'bitmap']
+
 
 def parse_args():
     """"""
     parser = ArgumentParser()
-    parser.add_argument('--device', '-d', default=settings.DEV_NAME)
+    parser.add_argument('--device', '-d', default=settings.DEV_NAME, help='AP device name, a comma separated list of them, "{}" for every AP device, or "{}" to run the automata on the host CPU'.format(settings.ALL_DEV_NAME, settings.CPU_DEV_NAME))
+    parser.add_argument('--engine', '-e', choices=ENGINES, default='automata', help='Support counting engine; auto picks automata or bitmap per level by estimated cost')
+    parser.add_argument('--stream', action='store_true', default=False, help='Parse the dataset into compact arrays through a memory map')
+    parser.add_argument('--remap', action='store_true', default=False, help='Renumber the frequent items densely by descending frequency before encoding')
+    parser.add_argument('--no-reduce', dest='reduce', action='store_false', default=True, help='Scan every transaction at every level instead of only those that can hold a candidate')
+    parser.add_argument('--sample', type=float, metavar='FRACTION', help='Mine this fraction of the transactions first and count only the itemsets it suggests may be frequent (automata and bitmap engines); the others are checked on bitsets of the full data, taking frequent items x transactions / 8 bytes of memory')
+    parser.add_argument('--seed', type=int, help='Random seed of --sample')
+    parser.add_argument('--output', '-o', help='Write the frequent itemsets of each level to this file ("-" for stdout)')
+    parser.add_argument('--format', '-f', choices=FORMATS, default='text', help='Output file format')
+    parser.add_argument('--supports', action='store_true', default=False, help='Write the support of each itemset (not with the automata or auto engines)')
+    parser.add_argument('--checkpoint', '-c', help='Save the mining state to this directory after every level')
+    parser.add_argument('--resume', action='store_true', default=False, help='Continue from the last level finished in the --checkpoint directory')
     parser.add_argument('--verbose', '-v', action='store_true', default=False)
+    parser.add_argument('--stats', action='store_true', default=False, help='Print counters and phase timings after each iteration')
     parser.add_argument('--max-k', '-k', type=int, required=True)
     parser.add_argument('--min-support', '-s', required=True, help='Minimum support threshold expressed as an exact value (n) or a percentage (n%%)')
     parser.add_argument('dataset_file')
     args = parser.parse_args()
+    if args.resume and not args.checkpoint:
+        parser.error('--resume requires --checkpoint')
+    if args.sample is not None and args.engine not in SAMPLED_ENGINES:
+        parser.error('--sample requires the {} engine'.format(' or '.join(SAMPLED_ENGINES)))
+    if args.sample is not None and not 0 < args.sample <= 1:
+        parser.error('--sample must be a fraction in (0, 1]')
 
     return args
 
-def import_dataset(dataset_file):
+def import_dataset(dataset_file, encode=True, stream=False):
     """"""
     ds = Dataset(dataset_file)
-    ds.parse_file()    
-    ds.encode_data()
+    if stream:
+        ds.parse_file_streaming()
+    else:
+        ds.parse_file()    
+    if encode:
+        ds.encode_data()
     return ds
 
-# TODO: write output to a file (add argument for filename)
+def create_engine(args, dataset, observer=None):
+    """"""
+    items = dataset.get_frequent_items(args.min_support)
+    if args.engine == 'bitmap':
+        return BitmapARM(items, args.min_support, dataset.iter_transactions(), observer=observer)
+    if args.engine == 'fpgrowth':
+        return FPGrowthARM(items, args.min_support, dataset.iter_transactions(), args.max_k, observer=observer)
+    if args.engine == 'auto':
+        return PlannedARM(items, args.min_support, dataset, dev_name=args.device, reduce=args.reduce,
+                          verbose=args.verbose, observer=observer)
+    if args.engine == 'eclat':
+        return EclatARM(items, args.min_support, dataset.iter_transactions(), args.max_k, observer=observer)
+    return ARM(items, args.min_support, dataset.num_id_bytes, dev_name=args.device, observer=observer)
+
 def main():
     """"""
     args = parse_args()
-    dataset = import_dataset(args.dataset_file)
+    checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+    state = checkpoint.load() if args.resume else None
 
-    args.min_support = utils.normalize_minsup(args.min_support, len(dataset.data))
-    if args.min_support > settings.MAX_DOUBLE_TARGET:
+    if state and checkpoint.has_dataset():
+        dataset = Dataset(args.dataset_file)
+        checkpoint.load_dataset(dataset)
+    else:
+        dataset = import_dataset(args.dataset_file, encode=False, stream=args.stream)
+
+    args.min_support = utils.normalize_minsup(args.min_support, dataset.num_transactions)
+    if args.engine == 'automata' and args.min_support > settings.MAX_DOUBLE_TARGET:
         sys.exit('{}: support must be <= {}!'.format(__file__, settings.MAX_DOUBLE_TARGET))
+    if args.supports and args.engine in STREAM_ENGINES:
+        sys.exit('{}: the {} engine does not count exact supports!'.format(__file__, args.engine))
+
+    restored = state and checkpoint.has_dataset()
+    if args.remap and not restored:
+        dataset.remap_items(args.min_support)
+    # Reduced levels are encoded from the parsed transactions, so the full
+    # stream is only needed when every level scans it
+    if args.engine in STREAM_ENGINES and not args.reduce and not dataset.encoded_data:
+        dataset.encode_data()
+    if checkpoint and not restored:
+        checkpoint.save_dataset(dataset)
+
+    params = None
+    if checkpoint:
+        params = {
+            'fingerprint': fingerprint(args.dataset_file),
+            'engine': args.engine,
+            'min_support': args.min_support,
+            'num_id_bytes': dataset.num_id_bytes,
+            'remap': args.remap,
+        }
+        if state and state['params'] != params:
+            sys.exit('{}: {} was saved by a run with different parameters!'.format(__file__, args.checkpoint))
+
+    stats = Stats() if args.stats else None
+    arm = create_engine(args, dataset, observer=stats)
+    if args.sample is not None:
+        arm = SampledARM(arm, dataset, args.max_k, args.sample, seed=args.seed, verbose=args.verbose)
+    supports = arm.supports if args.supports else None
+
+    sink = None
+    if args.output:
+        sink = open_sink(args.output, args.format, dataset.original_itemset,
+                         append=bool(state), size=state and state.get('output_size'))
+    elif args.verbose:
+        sink = TextSink(sys.stdout, dataset.original_itemset)
+
+    if state:
+        checkpoint.restore(arm, state)
+        start_k = state['k'] + 1
+        if args.verbose: print 'Resuming at k={}'.format(start_k)
+    else:
+        start_k = 2
+        if sink:
+            sink.write_level(1, arm.levels[1], supports)
+        if checkpoint:
+            checkpoint.save_level(arm, 1, params, sink and sink.tell())
 
-    arm = ARM(dataset.get_frequent_items(args.min_support), args.min_support, dataset.num_id_bytes, dev_name=args.device)
-    for k in xrange(2, args.max_k + 1):
+    for k in xrange(start_k, args.max_k + 1):
         if args.verbose: print 'Iteration k={}'.format(k)
 
         arm.init_iteration(k)
-        arm.execute_iteration(dataset.encoded_data)
-        if len(arm.itemsets) < 1:
-            print '  zero {}-itemsets satisfy minsup {}'.format(arm.k, arm.min_support)
+        data = dataset.encoded_data
+        if args.engine in STREAM_ENGINES and args.reduce and getattr(arm, 'scans_stream', True):
+            data = dataset.reduce_level(k, set(itertools.chain.from_iterable(arm.candidates)))
+        arm.execute_iteration(data)
+        if stats:
+            stats.end_iteration()
+            print stats.summary()
+        if sink:
+            sink.write_level(k, arm.levels[k], supports)
+        if checkpoint:
+            checkpoint.save_level(arm, k, params, sink and sink.tell())
+        if not arm.levels[k]:
+            print '  zero {}-itemsets satisfy minsup {}'.format(k, arm.min_support)
             break
-        # Print survivors list
-        if args.verbose: 
-            for i in sorted(arm.itemsets, key=lambda x: len(x)):
-                print '  {}'.format(sorted(list(i)))
 
+    if sink:
+        sink.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+from argparse import ArgumentParser
+import itertools
+import json
+import math
+
+from arm import ARM
+from bitmap import BitmapARM
+from capacity import CapacityDB
+from dataset import Dataset
+import settings
+from stats import Stats, TIMERS
+import utils
+
+# Calibration constants used until the host has been measured
+DEFAULT_CALIBRATION = {
+    'scan_rate': 1.33e8,    # Stream bytes per second; the ranks of a round scan in parallel
+    'fsm_load': 1e-2,       # Seconds to load and unload one FSM
+    'round': 1e-3,          # Seconds of fixed cost per round
+    'label': 2e-5,          # Seconds to label one candidate
+    'bitmap_word': 2e-9,    # Seconds per 64-bit word ANDed and counted
+    'bitmap_candidate': 2e-6,   # Seconds per candidate besides its words
+}
+
+
+def load_calibration(path=settings.PLANNER_CALIBRATION):
+    """Returns the saved calibration constants, or the defaults."""
+    calibration = dict(DEFAULT_CALIBRATION)
+    try:
+        with open(path) as fh:
+            calibration.update(json.load(fh))
+    except IOError:
+        pass
+    return calibration
+
+
+class Planner(object):
+    """Estimates the cost of counting one level with each engine.
+
+    The automata cost is the labeling of every candidate, plus loading every
+    FSM, plus streaming the data once per round (the FSMs of a round scan it
+    in parallel), plus a fixed cost per round. The CPU cost is ANDing the
+    bitsets of k items per candidate and counting the bits.
+    """
+    def __init__(self, calibration=None):
+        self.calibration = calibration or load_calibration()
+
+    def automata_cost(self, num_candidates, macros_per_fsm, rank_count, stream_len):
+        """Returns the estimated seconds and a dict of the figures behind them."""
+        c = self.calibration
+        fsms = int(math.ceil(float(num_candidates) / macros_per_fsm))
+        rounds = int(math.ceil(float(fsms) / rank_count))
+        scanned = rounds * stream_len
+        cost = (num_candidates * c['label'] + fsms * c['fsm_load'] + rounds * c['round'] +
+                float(scanned) / c['scan_rate'])
+        return cost, {'rounds': rounds, 'fsms': fsms, 'bytes': scanned}
+
+    def bitmap_cost(self, num_candidates, k, num_transactions):
+        """Returns the estimated seconds and a dict of the figures behind them."""
+        c = self.calibration
+        words = num_candidates * k * ((num_transactions + 63) // 64)
+        cost = words * c['bitmap_word'] + num_candidates * c['bitmap_candidate']
+        return cost, {'words': words}
+
+    def choose(self, num_candidates, k, macros_per_fsm, rank_count, stream_len, num_transactions):
+        """Returns 'automata' or 'bitmap', whichever is cheaper, and a log line saying why."""
+        automata, a = self.automata_cost(num_candidates, macros_per_fsm, rank_count, stream_len)
+        bitmap, b = self.bitmap_cost(num_candidates, k, num_transactions)
+        engine = 'automata' if automata < bitmap else 'bitmap'
+        reason = ('k={} {}: {} candidates; automata {:.3g}s ({} rounds, {} FSMs, {} bytes) '
+                  'vs bitmap {:.3g}s ({} words)').format(k, engine, num_candidates, automata, a['rounds'],
+                                                        a['fsms'], a['bytes'], bitmap, b['words'])
+        return engine, reason
+
+
+class PlannedARM(object):
+    """Counts each level on the board or on the CPU, whichever the planner
+    estimates is cheaper.
+
+    The items, itemsets and levels are kept here and shared with the ARM and
+    BitmapARM engines, so each level can be counted by either one. The
+    bitsets are only built the first time a level goes to the CPU. Exact
+    supports are not available, since the automata only report whether the
+    threshold was reached. A support beyond the automata counters leaves
+    every level to the bitmaps.
+    """
+    def __init__(self, initial_items, min_support, dataset, dev_name=settings.DEV_NAME, planner=None,
+                 reduce=True, verbose=False, observer=None):
+        """Constructor.
+
+        Args:
+            dataset: Parsed Dataset; encoded too unless reduce is set.
+            planner: Planner; defaults to one using the saved calibration.
+            reduce: Whether the automata levels scan the stream of
+                    Dataset.reduce_level rather than the full one.
+            verbose: Print the reason for each choice.
+
+        See ARM for the other arguments.
+        """
+        self.initial_items = initial_items
+        self.min_support = min_support
+        self.dataset = dataset
+        self.planner = planner or Planner()
+        self.reduce = reduce
+        self.verbose = verbose
+        self.observer = observer
+        self.frequent_items = set(initial_items)
+        self.itemsets = set([frozenset([x]) for x in self.frequent_items])
+        self.levels = {1: set(self.itemsets)}
+
+        self.arm = None
+        if min_support <= settings.MAX_DOUBLE_TARGET:
+            self.arm = ARM(initial_items, min_support, dataset.num_id_bytes, dev_name=dev_name, observer=observer)
+            self.share_(self.arm)
+        self.bitmap = None
+
+        self.engine = None
+        self.k = None
+        self.plans = {}
+
+    @property
+    def items(self):
+        return self.frequent_items
+
+    @items.setter
+    def items(self, items):
+        # Updated in place, since the engines hold the same set
+        self.frequent_items.clear()
+        self.frequent_items.update(items)
+
+    @property
+    def candidates(self):
+        return self.engine.candidates
+
+    @property
+    def scans_stream(self):
+        """Whether execute_iteration needs the encoded stream of this level."""
+        return self.engine is self.arm
+
+    def share_(self, engine):
+        """Makes engine count into the items, itemsets and levels kept here."""
+        engine.items = self.frequent_items
+        engine.itemsets = self.itemsets
+        engine.levels = self.levels
+
+    def get_bitmap_(self):
+        """Returns the BitmapARM, building its bitsets the first time."""
+        if self.bitmap is None:
+            self.bitmap = BitmapARM(self.initial_items, self.min_support, self.dataset.iter_transactions(),
+                                    observer=self.observer)
+            self.share_(self.bitmap)
+        return self.bitmap
+
+    def macros_per_fsm_(self, k):
+        """Returns the macros per FSM of the level k automaton without loading it."""
+        if self.arm.software:
+            return settings.CPU_MACROS_PER_FSM
+        ick = 'i{}c{}k{}'.format(self.arm.num_id_bytes, self.arm.num_counters, k)
+        db = CapacityDB()
+        return db.capacity(ick) or db.estimate(ick) or settings.PLANNER_MACROS_PER_FSM
+
+    def init_iteration(self, k):
+        """Plans level k and initializes the engine chosen for it.
+
+        The candidates are generated once, for the estimate, and handed to
+        the chosen engine.
+        """
+        self.k = k
+        candidates = utils.apriori_gen(self.levels.get(k - 1, []), k)
+        if self.arm is None:
+            name, reason = 'bitmap', 'k={} bitmap: support exceeds the automata counters'.format(k)
+        else:
+            if self.reduce:
+                stream_len = self.dataset.reduced_length(k, set(itertools.chain.from_iterable(candidates)))
+            else:
+                stream_len = len(self.dataset.encoded_data)
+            rank_count = sum(x.get_rank_count() for x in self.arm.devices)
+            name, reason = self.planner.choose(len(candidates), k, self.macros_per_fsm_(k), rank_count,
+                                               stream_len, self.dataset.num_transactions)
+        self.plans[k] = reason
+        if self.verbose:
+            print '  plan {}'.format(reason)
+
+        self.engine = self.arm if name == 'automata' else self.get_bitmap_()
+        self.engine.init_iteration(k, candidates)
+
+    def execute_iteration(self, data=None):
+        """"""
+        self.engine.execute_iteration(data)
+
+
+def calibrate(dataset_file, min_support, max_k, dev_name=settings.DEV_NAME):
+    """Measures the calibration constants by mining a dataset with both engines.
+
+    Every level up to max_k is counted once on the device and once with
+    bitmaps, and the constants are derived from the per-phase timings. The
+    wall time the phases do not account for is the fixed cost per round on
+    the device, and the cost per candidate besides its words on the CPU.
+    """
+    dataset = Dataset(dataset_file)
+    dataset.parse_file()
+    dataset.encode_data()
+    min_support = utils.normalize_minsup(min_support, dataset.num_transactions)
+    items = dataset.get_frequent_items(min_support)
+    total = lambda table, name: sum(table[k][name] for k in table)
+
+    stats = Stats()
+    arm = ARM(items, min_support, dataset.num_id_bytes, dev_name=dev_name, pipeline_depth=0, observer=stats)
+    for k in xrange(2, max_k + 1):
+        arm.init_iteration(k)
+        arm.execute_iteration(dataset.encoded_data)
+        stats.end_iteration()
+    counters, timers = stats.counters, stats.timers
+
+    calibration = load_calibration()
+    if total(counters, 'fsms'):
+        calibration['fsm_load'] = (total(timers, 'load') + total(timers, 'unload')) / total(counters, 'fsms')
+        calibration['label'] = total(timers, 'label') / max(total(counters, 'candidates'), 1)
+    if total(timers, 'scan'):
+        calibration['scan_rate'] = total(counters, 'rounds') * len(dataset.encoded_data) / total(timers, 'scan')
+    if total(counters, 'rounds'):
+        phases = sum(total(timers, x) for x in TIMERS)
+        calibration['round'] = max(sum(stats.wall.values()) - phases, 0.0) / total(counters, 'rounds')
+
+    stats = Stats()
+    bitmap = BitmapARM(items, min_support, dataset.iter_transactions(), observer=stats)
+    words = 0
+    for k in xrange(2, max_k + 1):
+        bitmap.init_iteration(k)
+        bitmap.execute_iteration()
+        stats.end_iteration()
+        words += len(bitmap.candidates) * k * ((dataset.num_transactions + 63) // 64)
+    if words:
+        calibration['bitmap_word'] = total(stats.timers, 'scan') / words
+        calibration['bitmap_candidate'] = (max(sum(stats.wall.values()) - total(stats.timers, 'scan'), 0.0) /
+                                           total(stats.counters, 'candidates'))
+    return calibration
+
+def parse_args():
+    """"""
+    parser = ArgumentParser(description='Measures the engine planner calibration constants on this host')
+    parser.add_argument('--device', '-d', default=settings.DEV_NAME, help='AP device name, or "{}" to run the automata on the host CPU'.format(settings.CPU_DEV_NAME))
+    parser.add_argument('--max-k', '-k', type=int, default=3)
+    parser.add_argument('--min-support', '-s', required=True, help='Minimum support threshold expressed as an exact value (n) or a percentage (n%%)')
+    parser.add_argument('--output', '-o', default=settings.PLANNER_CALIBRATION, help='Calibration file to write')
+    parser.add_argument('dataset_file')
+    return parser.parse_args()
+
+def main():
+    """"""
+    args = parse_args()
+    calibration = calibrate(args.dataset_file, args.min_support, args.max_k, args.device)
+    utils.atomic_write(args.output, json.dumps(calibration, indent=2, sort_keys=True))
+    for name in sorted(calibration):
+        print '{:<18} {:.4g}'.format(name, calibration[name])
+
+
+if __name__ == '__main__':
+    main()
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,147 @@
+from bitmap import BitmapARM
+import settings
+
+
+class SampledARM(object):
+    """Counts on the wrapped engine only the candidates a random sample
+    finds frequent.
+
+    A sample of the transactions is mined on the CPU at a lowered threshold
+    (Toivonen). While every frequent itemset found so far was also frequent
+    in the sample, each level is split: the candidates frequent in the
+    sample go to the wrapped engine, and the rest, which the sample places
+    in the negative border, are checked on the CPU with bitmaps of the full
+    data. Most candidates are infrequent, so the automata need far fewer
+    rounds. Once a frequent itemset turns up that the sample missed, the
+    sample is not trusted any more and every later level is counted on the
+    wrapped engine alone. Either way every candidate is counted on the full
+    data, so the result is exact.
+    """
+    def __init__(self, engine, dataset, max_k, fraction=settings.SAMPLE_FRACTION, slack=settings.SAMPLE_SLACK,
+                 seed=None, verbose=False):
+        """Constructor.
+
+        Args:
+            engine: Level-wise engine (ARM or BitmapARM) counting on the full data.
+            dataset: Parsed Dataset the engine counts.
+            max_k: Largest itemsets to mine.
+            fraction: Fraction of the transactions to sample.
+            slack: Factor lowering the sample's threshold below min support, so
+                   fewer frequent itemsets are missed.
+            seed: Random seed of the sample.
+            verbose: Print when counting falls back to full levels.
+        """
+        self.engine = engine
+        self.dataset = dataset
+        self.verbose = verbose
+        self.k = None
+        self.fallback = None
+        self.border = []
+        self.verifier = None
+
+        sample = dataset.sample(fraction, seed)
+        ratio = float(engine.min_support) / max(dataset.num_transactions, 1)
+        self.sample_support = max(int(ratio * sample.num_transactions * slack), 1)
+
+        miner = BitmapARM(sample.get_frequent_items(self.sample_support), self.sample_support,
+                          sample.iter_transactions())
+        self.frequent = {1: miner.levels[1]}
+        for k in xrange(2, max_k + 1):
+            miner.init_iteration(k)
+            miner.execute_iteration()
+            self.frequent[k] = miner.levels[k]
+            if not miner.levels[k]:
+                break
+
+    @property
+    def min_support(self):
+        return self.engine.min_support
+
+    @property
+    def observer(self):
+        return self.engine.observer
+
+    @property
+    def items(self):
+        return self.engine.items
+
+    @items.setter
+    def items(self, items):
+        self.engine.items = items
+
+    @property
+    def itemsets(self):
+        return self.engine.itemsets
+
+    @property
+    def levels(self):
+        return self.engine.levels
+
+    @property
+    def candidates(self):
+        return self.engine.candidates
+
+    @property
+    def supports(self):
+        return self.engine.supports
+
+    def init_iteration(self, k):
+        """Initializes the engine and moves the candidates the sample finds
+        infrequent to the border.
+
+        Level k - 1 is checked first: a frequent itemset the sample did not
+        find frequent means the sample is not representative, so from then
+        on every candidate is left to the engine. The stream reduced for the
+        earlier levels lacks the border's items, so the next reduce_level
+        starts over from every transaction.
+        """
+        self.k = k
+        self.border = []
+        if self.fallback is None:
+            missed = self.levels.get(k - 1, set()) - self.frequent.get(k - 1, set())
+            if missed:
+                self.fallback = k
+                self.dataset.level_k = None
+                if self.verbose:
+                    print '  sample missed {} frequent {}-itemsets; counting every candidate'.format(len(missed), k - 1)
+
+        self.engine.init_iteration(k)
+        if self.fallback is None:
+            frequent = self.frequent.get(k, set())
+            candidates = []
+            for x in self.engine.candidates:
+                (candidates if frozenset(x) in frequent else self.border).append(x)
+            self.engine.candidates = candidates
+            self.observer.count('border', len(self.border))
+
+    def execute_iteration(self, data=None):
+        """Counts the engine's candidates, then checks the border on the CPU.
+
+        The bitsets of the full data are built the first time there is a
+        border, and are timed as part of checking it.
+        """
+        self.engine.execute_iteration(data)
+        if not self.border:
+            return
+
+        with self.observer.timer('verify'):
+            if self.verifier is None:
+                items = [x for itemset in self.levels[1] for x in itemset]
+                self.verifier = BitmapARM(items, self.min_support, self.dataset.iter_transactions())
+            counts = self.verifier.count_support_(self.border)
+
+        supports = getattr(self.engine, 'supports', None)
+        found = 0
+        for itemset, count in zip(self.border, counts):
+            if count >= self.min_support:
+                itemset = frozenset(itemset)
+                self.items.update(itemset)
+                self.itemsets.add(itemset)
+                self.levels[self.k].add(itemset)
+                if supports is not None:
+                    supports[itemset] = int(count)
+                found += 1
+        self.observer.count('frequent', found)
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -1,14 +1,18 @@
 DEV_NAME = '/dev/frio0'
+ALL_DEV_NAME = 'all'
 
 ANML_PATH = 'anml'
 FSM_PATH = 'fsm'
 MAP_PATH = 'map'
 DATA_PATH = 'datasets'
+CACHE_MREFS = True
 
 DEFAULT_DELIM = 255
 DEFAULT_SYMBOL = '*'
 DEFAULT_TARGET = 1
 DEFAULT_CHUNK_SZ = 512
+SCAN_DEPTH = 8
+CPU_CHUNK_SZ = 2**16
 
 BLK_PER_DEV = 192
 BLK_PER_RANK = BLK_PER_DEV * 8
@@ -17,3 +21,30 @@ MAX_SINGLE_TARGET = 2**11
 MAX_DOUBLE_TARGET = MAX_SINGLE_TARGET**2
 
 COMPILE_TIMEOUT = 300
+COMPILE_JOB_TIMEOUT = 3 * COMPILE_TIMEOUT
+CAPACITY_DB = 'fsm/capacity.jsonl'
+
+CPU_DEV_NAME = 'cpu'
+CPU_MACROS_PER_FSM = 1024
+CPU_RANK_COUNT = 8
+
+BITMAP_BATCH_SZ = 1024
+
+ECLAT_PROCESSES = None
+
+PLANNER_CALIBRATION = 'fsm/planner.json'
+PLANNER_MACROS_PER_FSM = 512
+
+SAMPLE_FRACTION = 0.1
+SAMPLE_SLACK = 0.8
+
+PARSE_BLOCK_SZ = 2**24
+
+PIPELINE_DEPTH = 1
+
+BENCH_REPEAT = 3
+BENCH_WARMUP = 1
+BENCH_TOLERANCE = 0.1
+
+AUTOMATA_CACHE_PATH = 'cache'
+AUTOMATA_CACHE_BUDGET = 2**30
@@ -0,0 +1,149 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+FORMATS = ['text', 'json', 'npy']
+
+# Output buffer size of the text and JSON sinks
+BUFFER_SZ = 2**20
+
+# Lines joined per write by the text sink
+TEXT_BATCH_SZ = 4096
+
+
+class ResultSink(object):
+    """Writes the frequent itemsets of each level as soon as it is mined.
+
+    Only the itemsets of the level being written are held, so a run never
+    needs the whole result set in memory. Itemsets are written in the order
+    they are given; only the items within each itemset are sorted.
+    """
+    def __init__(self, fh, translate=None):
+        """Constructor.
+
+        Args:
+            fh: Open file to write to.
+            translate: Function mapping an itemset to the itemset to write, e.g.
+                       Dataset.original_itemset.
+        """
+        self.fh = fh
+        self.translate = translate
+
+    def write_level(self, k, itemsets, supports=None):
+        """Writes the itemsets of level k.
+
+        Args:
+            k: Number of items in each itemset.
+            itemsets: Iterable of frequent k-itemsets.
+            supports: Optional dict mapping each itemset to its support.
+        """
+        raise NotImplementedError
+
+    def items_(self, itemset):
+        """"""
+        if self.translate is not None:
+            itemset = self.translate(itemset)
+        return sorted(itemset)
+
+    def tell(self):
+        """Flushes the output and returns its size in bytes, or None for stdout."""
+        self.fh.flush()
+        if self.fh in (sys.stdout, sys.stderr):
+            return None
+        return self.fh.tell()
+
+    def close(self):
+        """"""
+        self.fh.flush()
+        if self.fh not in (sys.stdout, sys.stderr):
+            self.fh.close()
+
+
+class TextSink(ResultSink):
+    """Space separated items, one itemset per line, as read and written by
+    FIMI tools. Supports are appended SPMF style as ' #SUP: n'."""
+    def write_level(self, k, itemsets, supports=None):
+        """"""
+        lines = []
+        for itemset in itemsets:
+            line = ' '.join(str(x) for x in self.items_(itemset))
+            if supports is not None:
+                line = '{} #SUP: {}'.format(line, supports[itemset])
+            lines.append(line)
+            if len(lines) >= TEXT_BATCH_SZ:
+                self.fh.write('\n'.join(lines) + '\n')
+                lines = []
+        if lines:
+            self.fh.write('\n'.join(lines) + '\n')
+
+
+class JSONSink(ResultSink):
+    """One JSON object per itemset, with keys k, items and optionally support."""
+    def write_level(self, k, itemsets, supports=None):
+        """"""
+        for itemset in itemsets:
+            record = {'k': k, 'items': self.items_(itemset)}
+            if supports is not None:
+                record['support'] = supports[itemset]
+            self.fh.write(json.dumps(record) + '\n')
+
+
+class NumpySink(ResultSink):
+    """A sequence of .npy arrays, three per level.
+
+    Each level is written as a header array [k, count, has_supports], then a
+    count x k int64 array of items and, if has_supports, an int64 array of
+    supports. read_npy reads the levels back one at a time.
+    """
+    def write_level(self, k, itemsets, supports=None):
+        """"""
+        itemsets = list(itemsets)
+        items = np.array([self.items_(x) for x in itemsets], dtype=np.int64).reshape(len(itemsets), k)
+        np.save(self.fh, np.array([k, len(itemsets), supports is not None], dtype=np.int64))
+        np.save(self.fh, items)
+        if supports is not None:
+            np.save(self.fh, np.array([supports[x] for x in itemsets], dtype=np.int64))
+
+
+def open_sink(path, fmt='text', translate=None, append=False, size=None):
+    """Returns a sink of the given format writing to path ('-' for stdout).
+
+    With append, levels are added after those already in the file, e.g. when
+    resuming a run. The file is first cut back to size bytes if given, which
+    drops a level written after the last checkpoint.
+    """
+    if fmt not in FORMATS:
+        raise ValueError('Unknown output format: {}'.format(fmt))
+
+    if path == '-':
+        fh = sys.stdout
+    else:
+        if append and size is not None and os.path.isfile(path):
+            with open(path, 'r+b') as fh:
+                fh.truncate(size)
+        mode = 'a' if append else 'w'
+        fh = open(path, mode + 'b' if fmt == 'npy' else mode, BUFFER_SZ)
+
+    if fmt == 'json':
+        return JSONSink(fh, translate)
+    elif fmt == 'npy':
+        return NumpySink(fh, translate)
+    return TextSink(fh, translate)
+
+def read_npy(path):
+    """Yields (k, items, supports or None) for each level written by a NumpySink."""
+    with open(path, 'rb') as fh:
+        while True:
+            try:
+                header = np.load(fh)
+            except (EOFError, IOError, ValueError):
+                return
+            k, count, has_supports = header.tolist()
+            items = np.load(fh)
+            supports = np.load(fh) if has_supports else None
+            yield k, items, supports
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
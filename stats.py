@@ -0,0 +1,114 @@
+from collections import defaultdict
+import threading
+import time
+
+# Counters and timers in the order they are summarized
+COUNTERS = ['candidates', 'border', 'frequent', 'rounds', 'fsms', 'bytes', 'reports']
+TIMERS = ['generate', 'label', 'load', 'scan', 'drain', 'unload', 'process', 'verify']
+
+
+class NullTimer(object):
+    """Context manager that does nothing, shared by every disabled timer."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_TIMER = NullTimer()
+
+
+class Observer(object):
+    """Instrumentation hook of ARM and the device facades.
+
+    Engines report counters through count() and wrap timed phases in
+    timer(). This base class ignores everything, so instrumentation costs one
+    method call per event when it is switched off. Events are per level, per
+    round or per FSM, never per symbol.
+    """
+    def begin_iteration(self, k):
+        """"""
+        pass
+
+    def count(self, name, n=1):
+        """"""
+        pass
+
+    def timer(self, name):
+        """"""
+        return NULL_TIMER
+
+
+class Timer(object):
+    """"""
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.add_time(self.name, time.time() - self.start)
+        return False
+
+
+class Stats(Observer):
+    """Observer collecting counters and timers for each iteration.
+
+    Events may come from several threads (labeling is prefetched and rounds
+    run on every device at once), so updates are serialized with a lock.
+    Timers of overlapping phases add up separately, so their sum can exceed
+    the wall time of the iteration.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.k = None
+        self.counters = {}
+        self.timers = {}
+        self.start = {}
+        self.wall = {}
+
+    def begin_iteration(self, k):
+        """"""
+        with self.lock:
+            self.k = k
+            self.counters[k] = defaultdict(int)
+            self.timers[k] = defaultdict(float)
+            self.start[k] = time.time()
+
+    def end_iteration(self):
+        """"""
+        with self.lock:
+            self.wall[self.k] = time.time() - self.start[self.k]
+
+    def count(self, name, n=1):
+        """"""
+        with self.lock:
+            self.counters.setdefault(self.k, defaultdict(int))[name] += n
+
+    def add_time(self, name, seconds):
+        """"""
+        with self.lock:
+            self.timers.setdefault(self.k, defaultdict(float))[name] += seconds
+
+    def timer(self, name):
+        """"""
+        return Timer(self, name)
+
+    def summary(self, k=None):
+        """Returns a printable summary of iteration k (default the current one)."""
+        k = self.k if k is None else k
+        counters = self.counters.get(k, defaultdict(int))
+        timers = self.timers.get(k, defaultdict(float))
+        lines = ['Iteration k={} stats ({:.3f}s)'.format(k, self.wall.get(k, time.time() - self.start.get(k, time.time())))]
+        lines.append('  ' + ' '.join('{}={}'.format(x, counters[x]) for x in COUNTERS))
+        if counters['rounds']:
+            lines.append('  fsms/round={:.1f}'.format(float(counters['fsms']) / counters['rounds']))
+        lines.append('  ' + ' '.join('{}={:.3f}s'.format(x, timers[x]) for x in TIMERS))
+        return '\n'.join(lines)
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -1,3 +1,4 @@
+import tempfile
 import unittest
 
 import micronap.sdk as ap
@@ -65,6 +66,39 @@ class TestAPFacade(unittest.TestCase):
         self.assertEquals(len(reports), 3)
         for r in reports:
             self.assertTrue(isinstance(r, ap.ap_match_result))
+
+    def test_scan_views(self):
+        apf = APFacade(dev_name='//simulator/frio0', chunk_size=2)
+        apf.setup()
+        apf.load(self.fsm)
+        apf.open_flows()
+        self.assertEquals(len(apf.scan(memoryview('foo'))), 3)
+        with tempfile.TemporaryFile() as fh:
+            fh.write('foobar')
+            fh.flush()
+            self.assertEquals(len(apf.scan(fh)), 6)
+        apf.close_flows()
 	
+    def test_scan_depth(self):
+        class Device(object):
+            def __init__(self):
+                self.outstanding = []
+                self.max_outstanding = 0
+            def ScanFlows(self, chunks):
+                self.outstanding.append(len(self.outstanding))
+                self.max_outstanding = max(self.max_outstanding, len(self.outstanding))
+                return len(self.outstanding)
+            def Wait(self, wait):
+                self.outstanding.pop()
+            def GetMatches(self):
+                return []
+
+        apf = APFacade(dev_name='//simulator/frio0', chunk_size=2, scan_depth=3)
+        apf.device = Device()
+        apf.flows = ['flow']
+        self.assertEquals(apf.scan('x' * 100), [])
+        self.assertEquals(apf.device.max_outstanding, 3)
+        self.assertEquals(apf.device.outstanding, [])
+
 
 # vim: nu:et:ts=4:sw=4:fdm=indent
@@ -1,8 +1,11 @@
+import os
 import unittest
 
 import micronap.sdk as ap
 
 from arm import ARM
+from cpufacade import CPUFacade, Report, ReportAlias
+import settings
 import utils
 
 
@@ -17,6 +20,16 @@ class TestARM(unittest.TestCase):
         self.assertTrue(isinstance(arm.fsm, ap.Automaton))
         self.assertTrue(isinstance(arm.emap, ap.ElementMap))
 
+    def test_restore_mrefs(self):
+        arm = ARM([], 1)
+        arm.init_iteration(2)
+        self.assertEqual(len(arm.mrefs), arm.fsm_info.match_res)
+        self.assertTrue(os.path.isfile('{}.mref'.format(os.path.splitext(arm.paths['map'])[0])))
+
+        cached = ARM([], 1)
+        cached.init_iteration(2)
+        self.assertEqual(cached.mrefs, arm.mrefs)
+
     def test_generate_candidates(self):
         k = 2
         minsup = 1
@@ -24,6 +37,12 @@ class TestARM(unittest.TestCase):
         arm.init_iteration(k)
         self.assertEqual(arm.candidates, [(1, 2), (1, 3), (2, 3)])
 
+    def test_item_symbols(self):
+        arm = ARM([], 1, num_id_bytes=2, dev_name=settings.CPU_DEV_NAME)
+        self.assertEqual(arm.item_symbols_(7), [r'[\x00]', r'[\x07]'])
+        self.assertEqual(arm.item_symbols_(256), [r'[\x01]', r'[\x01]'])
+        self.assertTrue(arm.item_symbols_(7) is arm.item_symbols_(7))
+
     def test_process_reports(self):
         k = 2
         minsup = 1
@@ -31,6 +50,42 @@ class TestARM(unittest.TestCase):
         arm.init_iteration(k)
         arm.execute_iteration('\xff\x01\x02\x03\xff\xff\xff')
         self.assertEqual(arm.items, set([1, 2, 3]))
+
+    def test_process_reports_cpu(self):
+        k = 2
+        minsup = 1
+        arm = ARM([1, 2, 3, 4], minsup, dev_name=settings.CPU_DEV_NAME)
+        arm.init_iteration(k)
+        arm.execute_iteration('\xff\x01\x02\x03\xff\x04\xff\xff\xff')
+        self.assertEqual(arm.levels[2], set([frozenset([1, 2]), frozenset([1, 3]), frozenset([2, 3])]))
+
+    def test_process_reports_devices(self):
+        k = 2
+        minsup = 1
+        arm = ARM([1, 2, 3, 4], minsup, dev_name=settings.CPU_DEV_NAME)
+        arm.devices = [CPUFacade(), CPUFacade(), CPUFacade()]
+        for device in arm.devices:
+            device.get_rank_count = lambda: 1
+        arm.init_iteration(k)
+        arm.fsm.capacity = 1
+        arm.fsm_info = arm.fsm.GetInfo()
+        arm.execute_iteration('\xff\x01\x02\x03\xff\x04\xff\xff\xff')
+        self.assertEqual(arm.levels[2], set([frozenset([1, 2]), frozenset([1, 3]), frozenset([2, 3])]))
 	
+    def test_process_reports_flow_proxies(self):
+        class Flow(object):
+            """Compares by handle but hashes by identity, like a fresh SWIG proxy."""
+            def __init__(self, handle):
+                self.handle = handle
+            def __eq__(self, other):
+                return self.handle == other.handle
+
+        arm = ARM([1, 2, 3, 4], 1, dev_name=settings.CPU_DEV_NAME)
+        arm.init_iteration(2)
+        flows = [Flow(0), Flow(1)]
+        arm.round_flows, arm.round_offsets = flows, [0, 3]
+        arm.flow_offsets = dict(zip(flows, arm.round_offsets))
+        arm.process_reports([Report(Flow(1), 0, ReportAlias(2)), Report(flows[0], 0, ReportAlias(1))])
+        self.assertEqual(arm.levels[2], set([frozenset(arm.candidates[0]), frozenset(arm.candidates[4])]))
 
 # vim: nu:et:ts=4:sw=4:fdm=indent
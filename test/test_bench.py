@@ -0,0 +1,34 @@
+import unittest
+
+from bench import *
+import settings
+
+
+class TestBench(unittest.TestCase):
+    def test_case_name(self):
+        self.assertEquals(case_name({'dataset': 'chess', 'min_support': '90%', 'max_k': 4}), 'chess-s90%-k4')
+
+    def test_run_case(self):
+        case = {'dataset': 'simple', 'min_support': '2', 'max_k': 3}
+        times, itemsets = run_case(case, 'automata', settings.CPU_DEV_NAME)
+        self.assertEquals(set(times), set(STAGES))
+        self.assertTrue(times['total'] >= times['scan'] > 0)
+
+        times, bitmap_itemsets = run_case(case, 'bitmap')
+        self.assertEquals(bitmap_itemsets, itemsets)
+        self.assertEquals(times['label'], 0)
+
+    def test_compare(self):
+        case = {'dataset': 'simple', 'min_support': '2', 'max_k': 3}
+        baseline = benchmark([case], repeat=1, warmup=0)
+        self.assertEquals(compare(baseline, baseline), [])
+
+        current = json.loads(json.dumps(baseline))
+        name = case_name(case)
+        current['results'][name]['stages']['scan']['median'] += 1
+        current['results'][name]['itemsets'] += 1
+        regressions = compare(baseline, current)
+        self.assertEquals([x[:2] for x in regressions], [(name, 'itemsets'), (name, 'scan')])
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,74 @@
+import itertools
+import os
+import unittest
+
+import numpy as np
+
+from bitmap import BitmapARM, popcount_rows
+from dataset import Dataset
+import settings
+
+
+class TestBitmapARM(unittest.TestCase):
+    def mine(self, name, max_k, minsup):
+        ds = Dataset(os.path.join(settings.DATA_PATH, '{}.dat'.format(name)))
+        ds.parse_file()
+        arm = BitmapARM(ds.get_frequent_items(minsup), minsup, ds.data)
+        for k in xrange(2, max_k + 1):
+            arm.init_iteration(k)
+            arm.execute_iteration()
+        return ds, arm
+
+    def test_popcount_rows(self):
+        bitsets = np.array([[0, 0], [255, 1], [3, 128]], dtype=np.uint8)
+        self.assertEquals(list(popcount_rows(bitsets)), [0, 9, 3])
+
+    def test_init_empty(self):
+        arm = BitmapARM([], 1, [])
+        arm.init_iteration(2)
+        arm.execute_iteration()
+        self.assertEquals(arm.itemsets, set())
+
+    def test_generate_candidates(self):
+        arm = BitmapARM([1, 2, 3], 1, [[1, 2, 3]])
+        arm.init_iteration(2)
+        self.assertEqual(sorted(arm.candidates), [(1, 2), (1, 3), (2, 3)])
+
+    def test_generate_candidates_pruned(self):
+        arm = BitmapARM([1, 2, 3, 4], 2, [[1, 2, 3], [1, 2, 3], [1, 4], [4]])
+        arm.init_iteration(2)
+        arm.execute_iteration()
+        self.assertEquals(arm.levels[2], set([frozenset([1, 2]), frozenset([1, 3]), frozenset([2, 3])]))
+        arm.init_iteration(3)
+        self.assertEqual(arm.candidates, [(1, 2, 3)])
+
+    def test_contextPasquier99(self):
+        ds, arm = self.mine('contextPasquier99', 4, 2)
+        self.assertEquals(arm.items, set([1, 2, 3, 5]))
+        self.assertEquals(len(arm.itemsets), 15)
+        self.assertEquals(arm.supports[frozenset([1, 2, 3, 5])], 2)
+        self.assertEquals(arm.supports[frozenset([2, 5])], 4)
+
+    def test_large_ids(self):
+        ds, arm = self.mine('large_ids', 3, 3)
+        self.assertEquals(arm.items, set([1, 10, 1000]))
+        self.assertEquals(len(arm.itemsets), 7)
+
+    def test_multi_round(self):
+        minsup = 3000
+        ds, arm = self.mine('multi_round', 3, minsup)
+
+        expected = {}
+        items = sorted(ds.get_frequent_items(minsup))
+        rows = [set(row) for row in ds.data]
+        for k in xrange(1, 4):
+            for c in itertools.combinations(items, k):
+                support = sum(1 for row in rows if row.issuperset(c))
+                if support >= minsup:
+                    expected[frozenset(c)] = support
+
+        self.assertEquals(arm.itemsets, set(expected))
+        self.assertEquals(arm.supports, expected)
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from cache import AutomataCache
+
+
+class TestAutomataCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_key(self):
+        cache = AutomataCache(path=self.tmpdir)
+        self.assertEquals(cache.key(2, 1, 1), cache.key(2, 1, 1))
+        self.assertNotEquals(cache.key(2, 1, 1), cache.key(3, 1, 1))
+        self.assertTrue(cache.key(2, 1, 3).startswith('i1c3k2-'))
+
+        cache.version = 'changed'
+        self.assertNotEquals(cache.key(2, 1, 1), AutomataCache(path=self.tmpdir).key(2, 1, 1))
+
+    def test_get(self):
+        cache = AutomataCache(path=self.tmpdir)
+        paths = cache.get(2, 1, 1)
+        for ext in ['anml', 'fsm', 'map']:
+            self.assertTrue(os.path.isfile(paths[ext]))
+        self.assertEquals(cache.get(2, 1, 1), paths)
+        self.assertEquals([x for x in os.listdir(self.tmpdir) if x.startswith('.')], [])
+
+    def test_evict(self):
+        cache = AutomataCache(path=self.tmpdir, budget=0)
+        first = cache.get(2, 1, 1)
+        second = cache.get(3, 1, 1)
+        self.assertFalse(os.path.exists(first['fsm']))
+        self.assertTrue(os.path.exists(second['fsm']))
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
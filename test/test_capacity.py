@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from capacity import CapacityDB, fits, search_capacity
+import settings
+
+
+class TestCapacity(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db = CapacityDB(os.path.join(self.tmpdir, 'capacity.jsonl'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def counting_fits(self, capacity):
+        attempts = []
+        def fits_count(count):
+            attempts.append(count)
+            return count <= capacity
+        return fits_count, attempts
+
+    def test_fits(self):
+        self.assertTrue(fits(settings.BLK_PER_RANK, 8))
+        self.assertFalse(fits(settings.BLK_PER_RANK + 1, 1))
+        self.assertFalse(fits(1, 9))
+        self.assertFalse(fits(1, None))
+
+    def test_search_capacity(self):
+        for capacity in [0, 1, 2, 37, 100, 1000]:
+            for guess in [1, 30, 40, 5000]:
+                fits_count, attempts = self.counting_fits(capacity)
+                self.assertEquals(search_capacity(fits_count, guess=guess), capacity)
+
+    def test_search_capacity_close_guess(self):
+        fits_count, attempts = self.counting_fits(1000)
+        self.assertEquals(search_capacity(fits_count, guess=999), 1000)
+        self.assertTrue(len(attempts) <= 4)
+
+    def test_search_capacity_known_bounds(self):
+        fits_count, attempts = self.counting_fits(50)
+        self.assertEquals(search_capacity(fits_count, lo=50, hi=51, guess=10), 50)
+        self.assertEquals(attempts, [])
+
+    def test_search_capacity_deadline(self):
+        fits_count, attempts = self.counting_fits(50)
+        self.assertEquals(search_capacity(fits_count, lo=3, guess=10, deadline=0), 3)
+        self.assertEquals(attempts, [])
+
+    def test_db_empty(self):
+        self.assertEquals(self.db.records('i1c1k2'), [])
+        self.assertEquals(self.db.bounds('i1c1k2'), (0, None))
+        self.assertEquals(self.db.estimate('i1c1k2'), None)
+        self.assertEquals(self.db.capacity('i1c1k2'), None)
+
+    def test_db(self):
+        self.db.record('i1c1k2', 1, 4, 1)
+        self.db.record('i1c1k2', 10, 24, 2)
+        self.db.record('i1c1k2', 100, settings.BLK_PER_RANK + 1, float('inf'))
+        self.db.record('i1c1k3', 5, 5, 1)
+
+        self.assertEquals(len(self.db.records('i1c1k2')), 3)
+        self.assertEquals(self.db.bounds('i1c1k2'), (10, 100))
+        self.assertEquals(self.db.estimate('i1c1k2'), settings.BLK_PER_RANK * 10 // 24)
+        self.assertEquals(self.db.capacity('i1c1k2'), None)
+
+        self.db.record('i1c1k2', 11, settings.BLK_PER_RANK + 1, 1)
+        self.assertEquals(self.db.capacity('i1c1k2'), 10)
+
+    def test_db_other_macro_version(self):
+        self.db.record('i1c1k2', 1, 4, 1)
+        other = CapacityDB(self.db.path)
+        other.version = 'other'
+        self.assertEquals(other.records('i1c1k2'), [])
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
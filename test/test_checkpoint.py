@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from bitmap import BitmapARM
+from checkpoint import *
+from dataset import Dataset
+import settings
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.datafile = os.path.join(settings.DATA_PATH, 'contextPasquier99.dat')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def mine(self, ds, start_k, max_k, checkpoint=None, state=None):
+        arm = BitmapARM(ds.get_frequent_items(2), 2, ds.iter_transactions())
+        if state:
+            checkpoint.restore(arm, state)
+        elif checkpoint:
+            checkpoint.save_level(arm, 1, {'min_support': 2})
+        for k in xrange(start_k, max_k + 1):
+            arm.init_iteration(k)
+            arm.execute_iteration()
+            if checkpoint:
+                checkpoint.save_level(arm, k, {'min_support': 2})
+        return arm
+
+    def test_fingerprint(self):
+        self.assertEquals(fingerprint(self.datafile), fingerprint(self.datafile))
+        self.assertNotEquals(fingerprint(self.datafile), fingerprint(os.path.join(settings.DATA_PATH, 'simple.dat')))
+
+        # Either end of a file changes its digest, even at the same size and time
+        fn = os.path.join(self.tmpdir, 'foo')
+        digests = set()
+        for contents in ['1 2\n' * 10**6, '3 2\n' + '1 2\n' * (10**6 - 1), '1 2\n' * (10**6 - 1) + '1 3\n']:
+            with open(fn, 'w') as fh:
+                fh.write(contents)
+            os.utime(fn, (0, 0))
+            digests.add(fingerprint(fn))
+        self.assertEquals(len(digests), 3)
+
+    def test_load_empty(self):
+        checkpoint = Checkpoint(os.path.join(self.tmpdir, 'ckpt'))
+        self.assertEquals(checkpoint.load(), None)
+        self.assertFalse(checkpoint.has_dataset())
+
+    def test_dataset(self):
+        ds = Dataset(os.path.join(settings.DATA_PATH, 'large_ids.dat'))
+        ds.parse_file()
+        ds.remap_items(2)
+        ds.encode_data()
+        checkpoint = Checkpoint(self.tmpdir)
+        checkpoint.save_dataset(ds)
+        self.assertTrue(checkpoint.has_dataset())
+
+        restored = Dataset(ds.datafile)
+        checkpoint.load_dataset(restored)
+        self.assertEquals(restored.encoded_data, ds.encoded_data)
+        self.assertEquals(list(restored.iter_transactions()), list(ds.iter_transactions()))
+        self.assertEquals(restored.num_id_bytes, ds.num_id_bytes)
+        self.assertEquals(restored.num_transactions, ds.num_transactions)
+        self.assertEquals(restored.original_itemset([0, 1]), ds.original_itemset([0, 1]))
+        self.assertEquals(restored.get_frequent_items(2), ds.get_frequent_items(2))
+
+    def test_resume(self):
+        ds = Dataset(self.datafile)
+        ds.parse_file()
+        expected = self.mine(ds, 2, 4)
+
+        checkpoint = Checkpoint(self.tmpdir)
+        self.mine(ds, 2, 2, checkpoint)
+        state = Checkpoint(self.tmpdir).load()
+        self.assertEquals(state['k'], 2)
+        self.assertEquals(state['params'], {'min_support': 2})
+
+        arm = self.mine(ds, 3, 4, checkpoint, state)
+        self.assertEquals(arm.itemsets, expected.itemsets)
+        self.assertEquals(arm.levels, expected.levels)
+        self.assertEquals(arm.supports, expected.supports)
+        self.assertEquals(Checkpoint(self.tmpdir).load()['k'], 4)
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
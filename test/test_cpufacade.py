@@ -0,0 +1,114 @@
+import itertools
+import mmap
+import os
+import shutil
+import tempfile
+import unittest
+
+from cpufacade import CPUFacade, ItemsetAutomaton
+from dataset import Dataset
+import settings
+import utils
+
+
+class TestCPUFacade(unittest.TestCase):
+    def run_automaton(self, k, id_bytes, minsup, candidates, data):
+        apf = CPUFacade()
+        apf.setup()
+        fsm = apf.create_automaton(k, id_bytes, utils.get_counter_factors(minsup))
+        reports = apf.execute(fsm.Duplicate().label(candidates), data)
+        return set(candidates[r.report_alias.elementRef - 1] for r in reports)
+
+    def mine_dataset(self, name, k, minsup):
+        ds = Dataset(os.path.join(settings.DATA_PATH, '{}.dat'.format(name)))
+        ds.parse_file()
+        ds.encode_data()
+        items = sorted(ds.get_frequent_items(minsup))
+        candidates = list(itertools.combinations(items, k))
+        found = self.run_automaton(k, max(ds.num_id_bytes, 1), minsup, candidates, ds.encoded_data)
+
+        expected = set()
+        for c in candidates:
+            if sum(1 for row in ds.data if set(c) <= set(row)) >= minsup:
+                expected.add(c)
+        return found, expected
+
+    def test_get_info(self):
+        fsm = ItemsetAutomaton(2, 1, [1])
+        self.assertEquals(fsm.GetInfo().match_res, settings.CPU_MACROS_PER_FSM)
+        self.assertEquals(fsm.Duplicate().GetInfo(), fsm.GetInfo())
+
+    def test_label_too_many(self):
+        fsm = ItemsetAutomaton(2, 1, [1], capacity=1)
+        self.assertRaises(ValueError, fsm.label, [(1, 2), (1, 3)])
+
+    def test_scan_without_load(self):
+        apf = CPUFacade()
+        apf.setup()
+        self.assertEquals(apf.scan('foobar'), [])
+
+    def test_scan_with_load(self):
+        found = self.run_automaton(2, 1, 1, [(1, 2), (1, 3), (2, 4)], '\xff\x01\x02\x03\xff\xff\xff')
+        self.assertEquals(found, set([(1, 2), (1, 3)]))
+
+    def test_scan_report_shape(self):
+        apf = CPUFacade()
+        apf.setup()
+        fsm = apf.create_automaton(2, 1, [1]).label([(1, 2)])
+        apf.load([fsm])
+        apf.open_flows()
+        reports = apf.scan('\xff\x01\x02\xff\xff\xff', chunk_size=2)
+        self.assertEquals(len(reports), 1)
+        self.assertEquals(reports[0].flow, apf.flows[0])
+        self.assertEquals(reports[0].report_alias.elementRef, 1)
+        apf.close_flows()
+        apf.unload()
+        self.assertEquals(apf.flows, [])
+        self.assertEquals(apf.rtos, [])
+
+    def test_scan_views(self):
+        data = '\xff\x01\x02\x03\xff\xff\xff'
+        fn = os.path.join(tempfile.mkdtemp(), 'encoded')
+        with open(fn, 'wb') as fh:
+            fh.write(data)
+
+        for source in [bytearray(data), memoryview(data)]:
+            self.assertEquals(self.run_automaton(2, 1, 1, [(1, 2), (2, 4)], source), set([(1, 2)]))
+        with open(fn, 'rb') as fh:
+            self.assertEquals(self.run_automaton(2, 1, 1, [(1, 2), (2, 4)], fh), set([(1, 2)]))
+            fh.seek(0)
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            self.assertEquals(self.run_automaton(2, 1, 1, [(1, 3), (2, 4)], mm), set([(1, 3)]))
+            mm.close()
+        shutil.rmtree(os.path.dirname(fn))
+
+    def test_scan_2byte(self):
+        data = '\xff\x00\x01\x00\x02\x04\x03\xff\xff\xff'
+        found = self.run_automaton(2, 2, 1, [(1, 2), (1, 1023), (2, 1023), (1, 3)], data)
+        self.assertEquals(found, set([(1, 2), (1, 1023), (2, 1023)]))
+
+    def test_simple(self):
+        found, expected = self.mine_dataset('simple', 3, 2)
+        self.assertEquals(found, expected)
+
+    def test_large_ids(self):
+        found, expected = self.mine_dataset('large_ids', 3, 3)
+        self.assertEquals(found, expected)
+
+    def test_double_precision_counter(self):
+        found, expected = self.mine_dataset('double_precision_counter', 2, 3000)
+        self.assertEquals(found, expected)
+        self.assertEquals(found, set([(1, 2), (1, 3), (2, 3)]))
+
+    def test_double_precision_remainder_counter(self):
+        found, expected = self.mine_dataset('double_precision_remainder_counter', 3, 2053)
+        self.assertEquals(found, expected)
+        self.assertEquals(found, set([(1, 2, 3)]))
+
+    def test_remainder_counter_threshold(self):
+        data = '\xff\x01\x02' * 2053 + '\xff\x03' * 3 + '\xff\xff\xff'
+        self.assertEquals(self.run_automaton(2, 1, 2053, [(1, 2)], data), set([(1, 2)]))
+        self.assertEquals(self.run_automaton(2, 1, 2054, [(1, 2)], data), set())
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
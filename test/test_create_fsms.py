@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import create_fsms
+
+
+class TestBuildAll(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.tmpdir, 'cache')
+        self.build_automaton = create_fsms.build_automaton
+
+    def tearDown(self):
+        create_fsms.build_automaton = self.build_automaton
+        shutil.rmtree(self.tmpdir)
+
+    def fake_build(self, seconds=0.0, fail=None):
+        """Replaces build_automaton, in this process and the forked jobs,
+        with one recording when each job ran."""
+        marks = self.tmpdir
+
+        def build_automaton(k, id_bytes, num_counters, verbose, union, cache_path):
+            ick = 'i{}c{}k{}'.format(id_bytes, num_counters, k)
+            start = time.time()
+            if ick == fail:
+                raise RuntimeError('compile failed')
+            time.sleep(seconds)
+            with open(os.path.join(marks, '{}.mark'.format(ick)), 'w') as fh:
+                fh.write('{} {}'.format(start, time.time()))
+        create_fsms.build_automaton = build_automaton
+
+    def marks(self):
+        """Returns the (start, end) time of each finished job, by ick."""
+        marks = {}
+        for name in os.listdir(self.tmpdir):
+            if name.endswith('.mark'):
+                with open(os.path.join(self.tmpdir, name)) as fh:
+                    marks[name[:-5]] = map(float, fh.read().split())
+        return marks
+
+    def test_fan_out(self):
+        self.fake_build(seconds=0.5)
+        jobs = [(k, 1, 1) for k in xrange(2, 6)]
+        self.assertEquals(create_fsms.build_all(jobs, 2, cache_path=self.cache_path), [])
+
+        marks = self.marks()
+        self.assertEquals(sorted(marks), ['i1c1k2', 'i1c1k3', 'i1c1k4', 'i1c1k5'])
+        for ick in marks:
+            self.assertTrue(os.path.isfile(os.path.join(self.cache_path, '{}.log'.format(ick))))
+
+        # Never more jobs at once than processes, but more than one
+        events = sorted([(start, 1) for start, _ in marks.values()] + [(end, -1) for _, end in marks.values()])
+        running = peak = 0
+        for _, delta in events:
+            running += delta
+            peak = max(peak, running)
+        self.assertEquals(peak, 2)
+
+    def test_timeout(self):
+        self.fake_build(seconds=30)
+        start = time.time()
+        self.assertEquals(create_fsms.build_all([(2, 1, 1)], 1, timeout=1, cache_path=self.cache_path), ['i1c1k2'])
+        self.assertTrue(time.time() - start < 10)
+        self.assertEquals(self.marks(), {})
+
+    def test_failure(self):
+        self.fake_build(fail='i1c2k3')
+        jobs = [(2, 1, 2), (3, 1, 2), (4, 1, 2)]
+        self.assertEquals(create_fsms.build_all(jobs, 3, cache_path=self.cache_path), ['i1c2k3'])
+        self.assertEquals(sorted(self.marks()), ['i1c2k2', 'i1c2k4'])
+        with open(os.path.join(self.cache_path, 'i1c2k3.log')) as fh:
+            self.assertTrue('RuntimeError: compile failed' in fh.read())
+
+    def test_build_automaton(self):
+        from cache import AutomataCache
+
+        paths = self.build_automaton(2, 1, 1, union=False, cache_path=self.cache_path)
+        self.assertEquals(AutomataCache(self.cache_path).get(2, 1, 1), paths)
+        for ext in ['anml', 'fsm', 'map']:
+            self.assertTrue(os.path.isfile(paths[ext]))
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -3,10 +3,24 @@ import shutil
 import tempfile
 import unittest
 
+import numpy as np
+
 import settings
+import utils
 from dataset import Dataset
 
 
+def encode_reference(data, num_id_bytes):
+    """Encodes data one byte at a time, as encode_data originally did."""
+    out = []
+    for row in data:
+        out.append(chr(settings.DEFAULT_DELIM))
+        for item in row:
+            id_bytes = utils.to_base(item, settings.STE_ID_SPACE)
+            out += [chr(0)] * (num_id_bytes - len(id_bytes)) + [chr(i) for i in id_bytes]
+    return ''.join(out) + chr(settings.DEFAULT_DELIM) * 3
+
+
 class TestDataset(unittest.TestCase):
     def setUp(self):
         self.tmpdir = tempfile.mkdtemp()
@@ -34,6 +48,38 @@ class TestDataset(unittest.TestCase):
         ds.parse_file()
         self.assertEquals(ds.data, [[1, 2, 3, 4, 5]])
 
+    def test_parse_file_streaming_empty(self):
+        ds = Dataset(self.tmpfile)
+        ds.parse_file_streaming()
+        self.assertEquals(ds.num_transactions, 0)
+        self.assertEquals(list(ds.iter_transactions()), [])
+        self.assertEquals(ds.get_frequent_items(1), [])
+
+    def test_parse_file_streaming(self):
+        fn = os.path.join(self.tmpdir, 'foo')
+        with open(fn, 'w') as fh:
+            fh.write('1 2 3 4 5\n\n10 200 \r\n3000\n7')
+        ds = Dataset(fn)
+        ds.parse_file_streaming(block_size=4)
+        self.assertEquals(ds.item_array.dtype, np.int32)
+        self.assertEquals(list(ds.txn_offsets), [0, 5, 7, 8, 9])
+        self.assertEquals(list(ds.iter_transactions()), [[1, 2, 3, 4, 5], [10, 200], [3000], [7]])
+        self.assertEquals(ds.num_transactions, 4)
+        self.assertEquals(ds.item_counts[3], 1)
+        self.assertEquals(ds.num_id_bytes, 2)
+
+    def test_parse_file_streaming_matches_parse_file(self):
+        for name in ['contextPasquier99', 'large_ids', 'chess']:
+            fn = os.path.join(settings.DATA_PATH, '{}.dat'.format(name))
+            ds = Dataset(fn)
+            ds.parse_file()
+            streamed = Dataset(fn)
+            streamed.parse_file_streaming(block_size=4096)
+
+            self.assertEquals(list(streamed.iter_transactions()), ds.data)
+            self.assertEquals(streamed.num_id_bytes, ds.num_id_bytes)
+            self.assertEquals(streamed.get_frequent_items(2), sorted(ds.get_frequent_items(2)))
+
     def test_get_frequent_items_without_parse_file(self):
         fn = os.path.join(self.tmpdir, 'foo')
         with open(fn, 'w') as fh:
@@ -99,6 +145,137 @@ class TestDataset(unittest.TestCase):
         ds.encode_data()
 
         self.assertEquals(len(ds.encoded_data), 3*len(values) + 3)
+
+    def test_encode_data_matches_reference(self):
+        fn = os.path.join(self.tmpdir, 'foo')
+        with open(fn, 'w') as fh:
+            fh.write('0 1 254 255 256\n')
+            fh.write('7\n')
+            fh.write('65024 65025 300000\n')
+        for num_id_bytes in [0, 1, 2, 3]:
+            ds = Dataset(fn)
+            ds.parse_file()
+            ds.num_id_bytes = num_id_bytes
+            ds.encode_data()
+            self.assertEquals(str(ds.encoded_data), encode_reference(ds.data, num_id_bytes))
+
+    def test_encode_data_datasets(self):
+        for name in ['simple', 'large_ids', 'chess', 'retail']:
+            fn = os.path.join(settings.DATA_PATH, '{}.dat'.format(name))
+            ds = Dataset(fn)
+            ds.parse_file()
+            ds.encode_data()
+            expected = encode_reference(ds.data, ds.num_id_bytes)
+            self.assertEquals(str(ds.encoded_data), expected)
+
+            streamed = Dataset(fn)
+            streamed.parse_file_streaming()
+            streamed.encode_data()
+            self.assertEquals(str(streamed.encoded_data), expected)
+
+    def test_reduce_level(self):
+        fn = os.path.join(self.tmpdir, 'foo')
+        with open(fn, 'w') as fh:
+            fh.write('1 2 3 4\n')
+            fh.write('1 5\n')
+            fh.write('2 3 5\n')
+            fh.write('7\n')
+        ds = Dataset(fn)
+        ds.parse_file()
+        ds.encode_data()
+        full = str(ds.encoded_data)
+
+        data = ds.reduce_level(2, set([1, 2, 3]))
+        self.assertEquals(str(data), encode_reference([[1, 2, 3], [2, 3]], ds.num_id_bytes))
+        self.assertEquals(list(ds.level_lengths), [3, 2])
+
+        data = ds.reduce_level(3, [1, 2, 3])
+        self.assertEquals(str(data), encode_reference([[1, 2, 3]], ds.num_id_bytes))
+        self.assertEquals(str(ds.encoded_data), full)
+
+        # Going back to a lower level starts from every transaction again
+        data = ds.reduce_level(2, [1, 5])
+        self.assertEquals(str(data), encode_reference([[1, 5]], ds.num_id_bytes))
+
+        data = ds.reduce_level(3, [])
+        self.assertEquals(str(data), '\xff\xff\xff')
+
+    def test_reduce_level_streaming(self):
+        fn = os.path.join(settings.DATA_PATH, 'retail.dat')
+        ds = Dataset(fn)
+        ds.parse_file()
+        streamed = Dataset(fn)
+        streamed.parse_file_streaming()
+        items = set(ds.get_frequent_items(1000))
+        for k in [2, 3]:
+            expected = [[x for x in row if x in items] for row in ds.data]
+            expected = [row for row in expected if len(row) >= k]
+            self.assertEquals(ds.reduced_length(k, items), len(encode_reference(expected, ds.num_id_bytes)))
+            self.assertEquals(str(ds.reduce_level(k, items)), encode_reference(expected, ds.num_id_bytes))
+            self.assertEquals(str(streamed.reduce_level(k, items)), encode_reference(expected, ds.num_id_bytes))
+
+    def test_remap_items(self):
+        fn = os.path.join(self.tmpdir, 'foo')
+        with open(fn, 'w') as fh:
+            fh.write('300 7 9000\n')
+            fh.write('9000 7\n')
+            fh.write('5\n')
+            fh.write('9000 300\n')
+        ds = Dataset(fn)
+        ds.parse_file()
+        ds.remap_items(2)
+        self.assertEquals(list(ds.item_ids), [9000, 7, 300])
+        self.assertEquals(list(ds.iter_transactions()), [[0, 1, 2], [0, 1], [], [0, 2]])
+        self.assertEquals(ds.num_transactions, 4)
+        self.assertEquals(ds.num_id_bytes, 1)
+        self.assertEquals(ds.get_frequent_items(2), [0, 1, 2])
+        self.assertEquals(ds.original_itemset([0, 2]), frozenset([300, 9000]))
+
+        ds.encode_data()
+        self.assertEquals(str(ds.encoded_data), encode_reference([[0, 1, 2], [0, 1], [], [0, 2]], 1))
+
+    def test_sample(self):
+        fn = os.path.join(self.tmpdir, 'foo')
+        with open(fn, 'w') as fh:
+            for i in xrange(100):
+                fh.write('{} {}\n'.format(i % 3, 3 + i))
+        ds = Dataset(fn)
+        ds.parse_file()
+        sample = ds.sample(0.3, seed=1)
+        rows = list(sample.iter_transactions())
+        self.assertTrue(0 < sample.num_transactions < 100)
+        self.assertEquals(len(rows), sample.num_transactions)
+        self.assertEquals(sample.num_id_bytes, ds.num_id_bytes)
+        for row in rows:
+            self.assertEquals(row, [(row[1] - 3) % 3, row[1]])
+        self.assertEquals(sample.get_frequent_items(1), sorted(set(x for row in rows for x in row)))
+        self.assertEquals(list(ds.sample(0.3, seed=1).iter_transactions()), rows)
+        self.assertEquals(list(ds.sample(1).iter_transactions()), list(ds.iter_transactions()))
+
+    def test_remap_items_retail(self):
+        fn = os.path.join(settings.DATA_PATH, 'retail.dat')
+        minsup = 1000
+        ds = Dataset(fn)
+        ds.parse_file()
+        self.assertEquals(ds.num_id_bytes, 2)
+        frequent = set(ds.get_frequent_items(minsup))
+        expected = [sorted(x for x in row if x in frequent) for row in ds.data]
+
+        streamed = Dataset(fn)
+        streamed.parse_file_streaming()
+        for remapped in [ds, streamed]:
+            remapped.remap_items(minsup)
+            self.assertEquals(remapped.num_id_bytes, 1)
+            counts = list(remapped.item_counts)
+            self.assertEquals(counts, sorted(counts, reverse=True))
+            rows = [sorted(remapped.original_itemset(row)) for row in remapped.iter_transactions()]
+            self.assertEquals(rows, expected)
+
+    def test_encode_data_empty(self):
+        ds = Dataset(self.tmpfile)
+        ds.parse_file()
+        ds.encode_data()
+        self.assertEquals(str(ds.encoded_data), '\xff\xff\xff')
 	
 
 # vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,55 @@
+import os
+import unittest
+
+import numpy as np
+
+from bitmap import BitmapARM
+from dataset import Dataset
+from eclat import *
+import settings
+
+
+class TestEclat(unittest.TestCase):
+    def mine(self, ds, max_k, minsup, processes=None):
+        items = ds.get_frequent_items(minsup)
+        if processes is None:
+            arm = BitmapARM(items, minsup, ds.iter_transactions())
+        else:
+            arm = EclatARM(items, minsup, ds.iter_transactions(), max_k, processes=processes)
+        for k in xrange(2, max_k + 1):
+            arm.init_iteration(k)
+            arm.execute_iteration()
+        return arm
+
+    def compare(self, name, max_k, minsup, processes):
+        ds = Dataset(os.path.join(settings.DATA_PATH, '{}.dat'.format(name)))
+        ds.parse_file_streaming()
+        expected = self.mine(ds, max_k, minsup)
+        arm = self.mine(ds, max_k, minsup, processes)
+        self.assertEquals(arm.itemsets, expected.itemsets)
+        self.assertEquals(arm.levels, expected.levels)
+        for itemset in arm.itemsets:
+            self.assertEquals(arm.supports[itemset], expected.supports[itemset])
+
+    def test_eclat(self):
+        tids = lambda *x: np.array(x, dtype=np.int32)
+        members = [(3, tids(0, 2), 2), (2, tids(0, 1), 2), (1, tids(0, 1, 2), 3)]
+        results = []
+        eclat((), members, 2, 3, False, results)
+        self.assertEquals(sorted(results), [((1,), 3), ((2,), 2), ((2, 1), 2), ((3,), 2), ((3, 1), 2)])
+
+        results = []
+        eclat((), members, 2, 1, False, results)
+        self.assertEquals(len(results), 3)
+
+    def test_contextPasquier99(self):
+        self.compare('contextPasquier99', 4, 2, 1)
+
+    def test_chess(self):
+        self.compare('chess', 4, 2800, 2)
+
+    def test_retail(self):
+        self.compare('retail', 3, 500, 2)
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,60 @@
+import os
+import unittest
+
+from bitmap import BitmapARM
+from dataset import Dataset
+from fpgrowth import *
+import settings
+
+
+class TestFPGrowth(unittest.TestCase):
+    def mine(self, engine, ds, max_k, minsup):
+        items = ds.get_frequent_items(minsup)
+        if engine == 'bitmap':
+            arm = BitmapARM(items, minsup, ds.iter_transactions())
+        else:
+            arm = FPGrowthARM(items, minsup, ds.iter_transactions(), max_k)
+        for k in xrange(2, max_k + 1):
+            arm.init_iteration(k)
+            arm.execute_iteration()
+        return arm
+
+    def compare(self, name, max_k, minsup):
+        ds = Dataset(os.path.join(settings.DATA_PATH, '{}.dat'.format(name)))
+        ds.parse_file()
+        expected = self.mine('bitmap', ds, max_k, minsup)
+        arm = self.mine('fpgrowth', ds, max_k, minsup)
+        self.assertEquals(arm.itemsets, expected.itemsets)
+        self.assertEquals(arm.levels, expected.levels)
+        self.assertEquals(arm.items, expected.items)
+        for itemset in arm.itemsets:
+            self.assertEquals(arm.supports[itemset], expected.supports[itemset])
+
+    def test_build_tree(self):
+        tree = build_tree([([1, 2], 1), ([2, 3], 2), ([2], 1), ([4], 1)], 2)
+        self.assertEquals(tree.rank, {2: 0, 3: 1})
+        self.assertEquals(list(tree.item), [-1, 2, 3])
+        self.assertEquals(list(tree.parent), [-1, 0, 1])
+        self.assertEquals(list(tree.count), [0, 4, 2])
+        self.assertEquals(tree.support(3), 2)
+        self.assertEquals(list(tree.prefix_paths(3)), [([2], 2)])
+
+    def test_fpgrowth(self):
+        tree = build_tree([([1, 2, 3], 1), ([1, 2], 1), ([1, 3], 1)], 2)
+        self.assertEquals(fpgrowth(tree, 2, 3), {
+            frozenset([1]): 3, frozenset([2]): 2, frozenset([3]): 2,
+            frozenset([1, 2]): 2, frozenset([1, 3]): 2,
+        })
+        self.assertEquals(fpgrowth(tree, 2, 1), {frozenset([1]): 3, frozenset([2]): 2, frozenset([3]): 2})
+
+    def test_contextPasquier99(self):
+        self.compare('contextPasquier99', 4, 2)
+
+    def test_chess(self):
+        self.compare('chess', 5, 2800)
+
+    def test_retail(self):
+        self.compare('retail', 3, 800)
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
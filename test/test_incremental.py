@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from bitmap import BitmapARM
+from dataset import Dataset
+from incremental import IncrementalMiner
+import settings
+import utils
+
+
+class TestIncrementalMiner(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        with open(os.path.join(settings.DATA_PATH, 'chess.dat')) as fh:
+            self.lines = fh.readlines()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, lines):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as fh:
+            fh.writelines(lines)
+        return path
+
+    def mine(self, path, minsup, max_k):
+        ds = Dataset(path)
+        ds.parse_file()
+        minsup = utils.normalize_minsup(minsup, ds.num_transactions)
+        arm = BitmapARM(ds.get_frequent_items(minsup), minsup, ds.data)
+        for k in xrange(2, max_k + 1):
+            arm.init_iteration(k)
+            arm.execute_iteration()
+        return dict((x, arm.supports[x]) for x in arm.itemsets)
+
+    def check_updates(self, minsup, max_k, splits):
+        state = os.path.join(self.tmpdir, 'state.json')
+        miner = IncrementalMiner(minsup, max_k, state)
+        start = 0
+        for i, end in enumerate(splits):
+            if i:
+                miner = IncrementalMiner.load(state)
+            miner.update(self.write('part{}'.format(i), self.lines[start:end]))
+            miner.save()
+            start = end
+
+        expected = self.mine(self.write('all', self.lines[:splits[-1]]), minsup, max_k)
+        self.assertEquals(miner.frequent, expected)
+        self.assertEquals(IncrementalMiner.load(state).frequent, expected)
+        self.assertEquals(miner.num_transactions, splits[-1])
+        return miner
+
+    def test_percentage(self):
+        self.check_updates('85%', 4, [2000, 2500, 3196])
+
+    def test_absolute(self):
+        self.check_updates('2800', 3, [2800, 3196])
+
+    def test_rescan(self):
+        # The delta alone holds new frequent itemsets, which have to be counted in the old data
+        self.lines = ['1 2 3\n'] * 5 + ['3 4\n'] * 2 + ['5\n'] * 3 + ['1 2 3 4\n'] * 6
+        miner = self.check_updates('5', 3, [10, 16])
+        self.assertTrue(miner.rescanned > 0)
+        self.assertEquals(miner.frequent[frozenset([1, 4])], 6)
+        self.assertEquals(miner.frequent[frozenset([3, 4])], 8)
+
+    def test_border(self):
+        miner = self.check_updates('90%', 3, [3196])
+        for itemset in miner.border:
+            self.assertFalse(itemset in miner.frequent)
+            self.assertTrue(all(itemset - set([x]) in miner.frequent for x in itemset if len(itemset) > 1))
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
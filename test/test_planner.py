@@ -0,0 +1,140 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from bitmap import BitmapARM
+from checkpoint import Checkpoint
+from dataset import Dataset
+from planner import *
+import settings
+import utils
+
+
+class TestPlanner(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.targets = settings.MAX_SINGLE_TARGET, settings.MAX_DOUBLE_TARGET
+        self.apriori_gen = utils.apriori_gen
+        self.datafile = os.path.join(settings.DATA_PATH, 'contextPasquier99.dat')
+
+    def tearDown(self):
+        settings.MAX_SINGLE_TARGET, settings.MAX_DOUBLE_TARGET = self.targets
+        utils.apriori_gen = self.apriori_gen
+        shutil.rmtree(self.tmpdir)
+
+    def dataset(self):
+        ds = Dataset(self.datafile)
+        ds.parse_file()
+        ds.encode_data()
+        return ds
+
+    def expected(self, ds, max_k):
+        expected = BitmapARM(ds.get_frequent_items(2), 2, ds.data)
+        for k in xrange(2, max_k + 1):
+            expected.init_iteration(k)
+            expected.execute_iteration()
+        return expected
+
+    def test_load_calibration(self):
+        path = os.path.join(self.tmpdir, 'planner.json')
+        self.assertEquals(load_calibration(path), DEFAULT_CALIBRATION)
+        with open(path, 'w') as fh:
+            json.dump({'scan_rate': 1.0}, fh)
+        calibration = load_calibration(path)
+        self.assertEquals(calibration['scan_rate'], 1.0)
+        self.assertEquals(calibration['label'], DEFAULT_CALIBRATION['label'])
+
+    def test_automata_cost(self):
+        planner = Planner(dict(DEFAULT_CALIBRATION))
+        cost, figures = planner.automata_cost(1000, 100, 4, 2**20)
+        self.assertEquals(figures, {'rounds': 3, 'fsms': 10, 'bytes': 3 * 2**20})
+        self.assertTrue(planner.automata_cost(2000, 100, 4, 2**20)[0] > cost)
+
+        # The FSMs of a round scan the stream in parallel
+        planner = Planner(dict(DEFAULT_CALIBRATION, scan_rate=1.0, label=0, fsm_load=0, round=0))
+        self.assertEquals(planner.automata_cost(1000, 100, 4, 2**20)[0], 3 * 2**20)
+        self.assertEquals(planner.automata_cost(1000, 100, 10, 2**20)[0], 2**20)
+
+    def test_choose(self):
+        calibration = dict(DEFAULT_CALIBRATION)
+        calibration['bitmap_word'] = 1.0
+        engine, reason = Planner(calibration).choose(1000, 2, 100, 4, 2**20, 10**6)
+        self.assertEquals(engine, 'automata')
+        self.assertTrue(reason.startswith('k=2 automata: 1000 candidates'))
+
+        calibration['scan_rate'] = 1.0
+        calibration['bitmap_word'] = 0.0
+        self.assertEquals(Planner(calibration).choose(1000, 2, 100, 4, 2**20, 10**6)[0], 'bitmap')
+
+    def test_planned_arm(self):
+        ds = self.dataset()
+        expected = self.expected(ds, 4)
+        calls = []
+        def apriori_gen(itemsets, k):
+            calls.append(k)
+            return self.apriori_gen(itemsets, k)
+        utils.apriori_gen = apriori_gen
+
+        calibration = dict(DEFAULT_CALIBRATION)
+        for bitmap_word in [0.0, 1.0]:
+            calibration['bitmap_word'] = bitmap_word
+            arm = PlannedARM(ds.get_frequent_items(2), 2, ds, dev_name=settings.CPU_DEV_NAME,
+                             planner=Planner(calibration))
+            for k in xrange(2, 5):
+                arm.init_iteration(k)
+                self.assertEquals(arm.scans_stream, bool(bitmap_word))
+                arm.execute_iteration(ds.encoded_data)
+            self.assertEquals(arm.itemsets, expected.itemsets)
+            self.assertEquals(arm.levels, expected.levels)
+            self.assertEquals(sorted(arm.plans), [2, 3, 4])
+            # The bitsets are only built for a level counted on the CPU
+            self.assertEquals(arm.bitmap is None, bool(bitmap_word))
+
+        # Each level's candidates are generated once, by the planner
+        self.assertEquals(calls, [2, 3, 4] * 2)
+
+    def test_planned_arm_beyond_counters(self):
+        ds = self.dataset()
+        expected = self.expected(ds, 4)
+        settings.MAX_SINGLE_TARGET = settings.MAX_DOUBLE_TARGET = 1
+        self.assertRaises(NotImplementedError, utils.get_counter_factors, 2)
+
+        arm = PlannedARM(ds.get_frequent_items(2), 2, ds, dev_name=settings.CPU_DEV_NAME)
+        self.assertEquals(arm.arm, None)
+        for k in xrange(2, 5):
+            arm.init_iteration(k)
+            self.assertFalse(arm.scans_stream)
+            arm.execute_iteration(ds.encoded_data)
+        self.assertEquals(arm.levels, expected.levels)
+        self.assertTrue(arm.plans[2].startswith('k=2 bitmap: support exceeds'))
+
+    def test_planned_arm_resume(self):
+        ds = self.dataset()
+        expected = self.expected(ds, 4)
+        checkpoint = Checkpoint(self.tmpdir)
+        arm = PlannedARM(ds.get_frequent_items(2), 2, ds, dev_name=settings.CPU_DEV_NAME)
+        checkpoint.save_level(arm, 1, {})
+        arm.init_iteration(2)
+        arm.execute_iteration(ds.encoded_data)
+        checkpoint.save_level(arm, 2, {})
+
+        arm = PlannedARM(ds.get_frequent_items(2), 2, ds, dev_name=settings.CPU_DEV_NAME)
+        checkpoint.restore(arm, checkpoint.load())
+        for k in xrange(3, 5):
+            arm.init_iteration(k)
+            arm.execute_iteration(ds.encoded_data)
+        self.assertEquals(arm.itemsets, expected.itemsets)
+        self.assertEquals(arm.levels, expected.levels)
+
+    def test_calibrate(self):
+        calibration = calibrate(self.datafile, '2', 3, settings.CPU_DEV_NAME)
+        self.assertEquals(sorted(calibration), sorted(DEFAULT_CALIBRATION))
+        for name in ['scan_rate', 'label', 'bitmap_word']:
+            self.assertTrue(calibration[name] > 0)
+        for name in ['round', 'bitmap_candidate']:
+            self.assertNotEquals(calibration[name], DEFAULT_CALIBRATION[name])
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,106 @@
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+
+from arm import ARM
+from bitmap import BitmapARM
+from checkpoint import Checkpoint
+from dataset import Dataset
+from sampling import SampledARM
+import settings
+
+
+class TestSampling(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def mine(self, ds, max_k, minsup, **kwargs):
+        arm = BitmapARM(ds.get_frequent_items(minsup), minsup, ds.iter_transactions())
+        if kwargs:
+            arm = SampledARM(arm, ds, max_k, **kwargs)
+        candidates = 0
+        for k in xrange(2, max_k + 1):
+            arm.init_iteration(k)
+            candidates += len(arm.candidates)
+            arm.execute_iteration()
+        return arm, candidates
+
+    def compare(self, name, max_k, minsup, **kwargs):
+        ds = Dataset(os.path.join(settings.DATA_PATH, '{}.dat'.format(name)))
+        ds.parse_file()
+        expected, expected_candidates = self.mine(ds, max_k, minsup)
+        arm, candidates = self.mine(ds, max_k, minsup, **kwargs)
+        self.assertEquals(arm.itemsets, expected.itemsets)
+        self.assertEquals(arm.levels, expected.levels)
+        self.assertEquals(arm.items, expected.items)
+        return arm, candidates, expected_candidates
+
+    def test_chess(self):
+        # Dense data: nearly every candidate is frequent in the sample too
+        arm, candidates, expected = self.compare('chess', 3, 2000, fraction=0.2, slack=0.9, seed=1)
+        self.assertEquals(arm.fallback, None)
+        self.assertTrue(candidates < expected)
+
+    def test_retail(self):
+        arm, candidates, expected = self.compare('retail', 3, 800, fraction=0.1, seed=1)
+        self.assertEquals(arm.fallback, None)
+        self.assertTrue(candidates * 10 < expected)
+        for itemset in arm.itemsets:
+            self.assertTrue(arm.supports[itemset] >= 800)
+
+    def test_fallback(self):
+        # Without slack, this sample misses two frequent 3-itemsets, so level 4
+        # sends all of its candidates to the engine
+        arm, candidates, expected = self.compare('chess', 4, 2800, fraction=0.2, slack=1.0, seed=2)
+        self.assertEquals(arm.fallback, 4)
+        self.assertEquals(len(arm.levels[3] - arm.frequent[3]), 2)
+        self.assertEquals(expected, 862)
+        self.assertEquals(candidates, 803)
+
+    def test_fallback_reduced_stream(self):
+        fn = os.path.join(self.tmpdir, 'foo')
+        with open(fn, 'w') as fh:
+            fh.write('1 2 3\n' * 6 + '4\n' * 4)
+        ds = Dataset(fn)
+        ds.parse_file()
+        ds.encode_data()
+
+        arm = ARM(ds.get_frequent_items(3), 3, ds.num_id_bytes, dev_name=settings.CPU_DEV_NAME)
+        arm = SampledARM(arm, ds, 3, fraction=1)
+        # A sample that missed {1, 3} and {2, 3}
+        arm.frequent[2] = set([frozenset([1, 2])])
+        arm.frequent[3] = set()
+        for k in xrange(2, 4):
+            arm.init_iteration(k)
+            arm.execute_iteration(ds.reduce_level(k, set(itertools.chain.from_iterable(arm.candidates))))
+        self.assertEquals(arm.fallback, 3)
+        self.assertEquals(arm.levels[2], set([frozenset([1, 2]), frozenset([1, 3]), frozenset([2, 3])]))
+        self.assertEquals(arm.levels[3], set([frozenset([1, 2, 3])]))
+
+    def test_resume(self):
+        ds = Dataset(os.path.join(settings.DATA_PATH, 'retail.dat'))
+        ds.parse_file()
+        expected, _ = self.mine(ds, 3, 800)
+
+        checkpoint = Checkpoint(self.tmpdir)
+        arm = SampledARM(BitmapARM(ds.get_frequent_items(800), 800, ds.iter_transactions()), ds, 3, 0.1, seed=1)
+        checkpoint.save_level(arm, 1, {})
+        arm.init_iteration(2)
+        arm.execute_iteration()
+        checkpoint.save_level(arm, 2, {})
+
+        arm = SampledARM(BitmapARM(ds.get_frequent_items(800), 800, ds.iter_transactions()), ds, 3, 0.1, seed=1)
+        checkpoint.restore(arm, checkpoint.load())
+        arm.init_iteration(3)
+        arm.execute_iteration()
+        self.assertEquals(arm.itemsets, expected.itemsets)
+        self.assertEquals(arm.levels, expected.levels)
+        self.assertEquals(arm.supports, expected.supports)
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,62 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from sink import *
+
+
+class TestSink(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'out')
+        self.levels = {
+            1: [frozenset([3]), frozenset([1])],
+            2: [frozenset([3, 1])],
+            3: [],
+        }
+        self.supports = {frozenset([3]): 4, frozenset([1]): 5, frozenset([1, 3]): 2}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, fmt, supports=None, translate=None):
+        sink = open_sink(self.path, fmt, translate)
+        for k in sorted(self.levels):
+            sink.write_level(k, self.levels[k], supports)
+        sink.close()
+
+    def test_text(self):
+        self.write('text')
+        with open(self.path) as fh:
+            self.assertEquals(fh.read(), '3\n1\n1 3\n')
+
+        self.write('text', self.supports, lambda x: frozenset(10 * i for i in x))
+        with open(self.path) as fh:
+            self.assertEquals(fh.read(), '30 #SUP: 4\n10 #SUP: 5\n10 30 #SUP: 2\n')
+
+    def test_json(self):
+        self.write('json', self.supports)
+        with open(self.path) as fh:
+            records = [json.loads(x) for x in fh]
+        self.assertEquals(records[2], {'k': 2, 'items': [1, 3], 'support': 2})
+        self.assertEquals(len(records), 3)
+
+    def test_npy(self):
+        self.write('npy', self.supports)
+        levels = list(read_npy(self.path))
+        self.assertEquals([x[0] for x in levels], [1, 2, 3])
+        self.assertEquals(levels[0][1].tolist(), [[3], [1]])
+        self.assertEquals(levels[0][2].tolist(), [4, 5])
+        self.assertEquals(levels[1][1].tolist(), [[1, 3]])
+        self.assertEquals(levels[2][1].shape, (0, 3))
+
+        self.write('npy')
+        self.assertEquals([x[2] for x in read_npy(self.path)], [None, None, None])
+
+    def test_bad_format(self):
+        self.assertRaises(ValueError, open_sink, self.path, 'xml')
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -0,0 +1,77 @@
+import os
+import threading
+import unittest
+
+from bitmap import BitmapARM
+from cpufacade import CPUFacade
+from dataset import Dataset
+import settings
+from stats import *
+import utils
+
+
+class TestStats(unittest.TestCase):
+    def test_observer(self):
+        observer = Observer()
+        observer.begin_iteration(2)
+        observer.count('rounds')
+        with observer.timer('scan'):
+            pass
+        self.assertTrue(observer.timer('scan') is NULL_TIMER)
+
+    def test_stats(self):
+        stats = Stats()
+        stats.begin_iteration(2)
+        stats.count('rounds')
+        stats.count('fsms', 3)
+        with stats.timer('scan'):
+            pass
+        stats.add_time('scan', 1.0)
+        stats.end_iteration()
+        self.assertEquals(stats.counters[2]['rounds'], 1)
+        self.assertEquals(stats.counters[2]['fsms'], 3)
+        self.assertTrue(stats.timers[2]['scan'] >= 1.0)
+
+        summary = stats.summary(2)
+        self.assertTrue('rounds=1' in summary)
+        self.assertTrue('fsms/round=3.0' in summary)
+
+        stats.begin_iteration(3)
+        self.assertEquals(stats.counters[3]['rounds'], 0)
+        self.assertEquals(stats.counters[2]['rounds'], 1)
+
+    def test_stats_threads(self):
+        stats = Stats()
+        stats.begin_iteration(2)
+        def work():
+            for _ in xrange(1000):
+                stats.count('reports')
+        threads = [threading.Thread(target=work) for _ in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(stats.counters[2]['reports'], 4000)
+
+    def test_cpufacade(self):
+        stats = Stats()
+        stats.begin_iteration(2)
+        apf = CPUFacade(observer=stats)
+        fsm = apf.create_automaton(2, 1, utils.get_counter_factors(1))
+        data = '\xff\x01\x02\xff\xff\xff'
+        reports = apf.execute(fsm.Duplicate().label([(1, 2), (1, 3)]), data)
+        self.assertEquals(stats.counters[2]['reports'], len(reports))
+        self.assertEquals(stats.counters[2]['bytes'], len(data))
+
+    def test_bitmap(self):
+        stats = Stats()
+        ds = Dataset(os.path.join(settings.DATA_PATH, 'contextPasquier99.dat'))
+        ds.parse_file()
+        arm = BitmapARM(ds.get_frequent_items(2), 2, ds.data, observer=stats)
+        arm.init_iteration(2)
+        arm.execute_iteration()
+        self.assertEquals(stats.counters[2]['candidates'], len(arm.candidates))
+        self.assertEquals(stats.counters[2]['frequent'], len(arm.levels[2]))
+
+
+# vim: nu:et:ts=4:sw=4:fdm=indent
@@ -1,3 +1,7 @@
+import itertools
+import os
+import tempfile
+import time
 import unittest
 
 import settings
@@ -36,6 +40,75 @@ class TestUtils(unittest.TestCase):
         self.assertEquals(balanced_factor_pair(get_prime_factors(4096), 1, 1, 0), [64, 64])
         self.assertEquals(balanced_factor_pair(get_prime_factors(10000), 1, 1, 0), [100, 100])
 
+    def test_apriori_gen(self):
+        self.assertEquals(apriori_gen([], 2), [])
+        self.assertEquals(apriori_gen([[3], [1], [2]], 2), [(1, 2), (1, 3), (2, 3)])
+        self.assertEquals(apriori_gen([(1, 2), (1, 3), (2, 3), (2, 4)], 3), [(1, 2, 3)])
+        self.assertEquals(apriori_gen([(1, 2), (1, 3), (1, 4), (2, 3)], 3), [(1, 2, 3)])
+        self.assertEquals(apriori_gen([(1, 2, 3), (1, 2, 4), (1, 3, 4), (2, 3, 4)], 4), [(1, 2, 3, 4)])
+        self.assertEquals(apriori_gen([(1, 2, 3), (1, 2, 4), (1, 3, 4)], 4), [])
+
+    def test_chunk_view(self):
+        self.assertEquals(str(chunk_view('foobar', 2, 3)), 'oba')
+        self.assertEquals(str(chunk_view(bytearray('foobar'), 4, 3)), 'ar')
+        view = chunk_view(memoryview('foobar'), 0, 2)
+        self.assertTrue(isinstance(view, memoryview))
+        self.assertEquals(view.tobytes(), 'fo')
+
+    def test_scan_buffer(self):
+        with scan_buffer('foo') as buf:
+            self.assertEquals(buf, 'foo')
+        with tempfile.TemporaryFile() as fh:
+            with scan_buffer(fh) as buf:
+                self.assertEquals(len(buf), 0)
+            fh.write('foobar')
+            fh.flush()
+            with scan_buffer(fh) as buf:
+                self.assertEquals(str(chunk_view(buf, 3, 512)), 'bar')
+
+    def test_atomic_write(self):
+        fn = tempfile.mktemp()
+        atomic_write(fn, 'foo')
+        atomic_write(fn, 'bar')
+        with open(fn) as fh:
+            self.assertEquals(fh.read(), 'bar')
+        os.remove(fn)
+
+    def test_prefetch(self):
+        self.assertEquals(list(prefetch(xrange(10), 1)), range(10))
+        self.assertEquals(list(prefetch([], 2)), [])
+
+    def test_prefetch_error(self):
+        def failing():
+            yield 1
+            raise KeyError('foo')
+        it = prefetch(failing(), 1)
+        self.assertEquals(next(it), 1)
+        self.assertRaises(KeyError, next, it)
+
+    def test_prefetch_stop_early(self):
+        it = prefetch(itertools.count(), 2)
+        self.assertEquals(next(it), 0)
+        it.close()
+
+    def test_ordered_map(self):
+        def work(worker, item):
+            time.sleep(0.01 * (item % 3))
+            return worker, item
+        results = list(ordered_map(work, ['a', 'b', 'c'], xrange(20)))
+        self.assertEquals([x for _, x in results], range(20))
+        self.assertTrue(set(w for w, _ in results) <= set(['a', 'b', 'c']))
+        self.assertEquals(list(ordered_map(work, ['a'], [])), [])
+
+    def test_ordered_map_error(self):
+        def work(worker, item):
+            if item == 3:
+                raise KeyError('foo')
+            return item
+        it = ordered_map(work, ['a', 'b'], xrange(10))
+        self.assertEquals([next(it) for _ in xrange(3)], [0, 1, 2])
+        self.assertRaises(KeyError, next, it)
+
     def test_normalize_minsup(self):
         self.assertEquals(normalize_minsup('0%', 0), 0)
         self.assertEquals(normalize_minsup('100%', 0), 0)
@@ -49,5 +122,13 @@ class TestUtils(unittest.TestCase):
         self.assertEquals(normalize_minsup('0', 0), 0)
         self.assertEquals(normalize_minsup('100', 0), 100)
 
+    def test_lazy_module(self):
+        module = LazyModule('os.path')
+        self.assertEquals(module.module_, None)
+        self.assertEquals(module.join('a', 'b'), os.path.join('a', 'b'))
+        self.assertTrue(module.module_ is os.path)
+        self.assertRaises(AttributeError, getattr, module, 'no_such_function')
+        self.assertRaises(ImportError, getattr, LazyModule('no_such_module'), 'foo')
+
 
 # vim: nu:et:ts=4:sw=4:fdm=indent
@@ -1,5 +1,12 @@
+import contextlib
+import itertools
 import math
+import mmap
 import operator as op
+import os
+import Queue
+import sys
+import threading
 
 import settings
 
@@ -98,6 +105,31 @@ def balanced_factor_pair(factors, x, y, i):
         else:
             return [x2, y2]
 
+def apriori_gen(itemsets, k):
+    """Generates the candidate k-itemsets of the Apriori algorithm.
+
+    Frequent (k-1)-itemsets sharing their first k-2 items are joined, and any
+    candidate with a (k-1)-subset that is not frequent is pruned.
+
+    Args:
+        itemsets: Iterable of the frequent (k-1)-itemsets.
+        k: Size of the candidates to generate.
+
+    Returns:
+        A sorted list of candidate k-itemsets, each as a sorted tuple.
+    """
+    prev = set(tuple(sorted(x)) for x in itemsets)
+    candidates = []
+    for prefix, group in itertools.groupby(sorted(prev), key=lambda x: x[:-1]):
+        group = [x[-1] for x in group]
+        for i, a in enumerate(group):
+            for b in group[i + 1:]:
+                candidate = prefix + (a, b)
+                # The two subsets ending in a and b were joined, so skip them
+                if all(candidate[:j] + candidate[j + 1:] in prev for j in xrange(k - 2)):
+                    candidates.append(candidate)
+    return candidates
+
 def normalize_minsup(minsup, lines):
     """Returns minsup as an absolute number of lines.
     
@@ -114,5 +146,177 @@ def normalize_minsup(minsup, lines):
     else:
         return int(minsup)
 
+@contextlib.contextmanager
+def scan_buffer(data):
+    """Provides data in a form that chunk_view can slice without copying.
+
+    Args:
+        data: A str, bytearray, memoryview, mmap or open binary file. Files are
+              memory-mapped read-only until the context exits.
+    """
+    if hasattr(data, 'fileno'):
+        size = os.fstat(data.fileno()).st_size
+        if not size:
+            yield ''
+            return
+        mm = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
+    else:
+        yield data
+
+def chunk_view(data, offset, size):
+    """Returns a read-only view of data[offset:offset + size] without copying."""
+    if isinstance(data, memoryview):
+        return data[offset:offset + size]
+    return buffer(data, offset, size)
+
+def atomic_write(path, data):
+    """Writes data to path so readers see either the old or the new contents."""
+    tmp = '{}.tmp{}'.format(path, os.getpid())
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+    os.rename(tmp, path)
+
+def prefetch(iterable, depth):
+    """Iterates over iterable on a worker thread, staying up to depth items ahead.
+
+    An exception raised by the worker is re-raised in the consuming thread
+    with its original traceback. If the consumer stops early, the worker is
+    stopped too.
+
+    Args:
+        iterable: Iterable whose items are expensive to produce.
+        depth: Maximum number of items produced but not yet consumed.
+    """
+    queue = Queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                queue.put(entry, timeout=0.1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def worker():
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+        except Exception:
+            put((False, sys.exc_info()))
+            return
+        put((False, None))
+
+    thread = threading.Thread(target=worker)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            ok, item = queue.get()
+            if ok:
+                yield item
+            elif item is None:
+                break
+            else:
+                raise item[0], item[1], item[2]
+    finally:
+        stop.set()
+        thread.join()
+
+
+def ordered_map(func, workers, iterable, window=None):
+    """Applies func(worker, item) to every item, one thread per worker.
+
+    Each worker takes the next unclaimed item as soon as it is free, so faster
+    workers process more items. Results are yielded in the order of iterable
+    regardless of which worker finished first. An exception raised by func is
+    re-raised in the consuming thread with its original traceback.
+
+    Args:
+        func: Function of a worker and an item.
+        workers: Objects handed to func, e.g. one facade per device.
+        iterable: Items to process; it is only advanced by one thread at a time.
+        window: Maximum number of results held back waiting for an earlier
+                one; defaults to twice the number of workers.
+    """
+    workers = list(workers)
+    items = enumerate(iterable)
+    lock = threading.Lock()
+    slots = threading.Semaphore(window or 2 * len(workers))
+    queue = Queue.Queue()
+    stop = threading.Event()
+
+    def run(worker):
+        try:
+            while True:
+                slots.acquire()
+                with lock:
+                    if stop.is_set():
+                        return
+                    try:
+                        i, item = next(items)
+                    except StopIteration:
+                        return
+                queue.put((True, i, func(worker, item)))
+        except Exception:
+            stop.set()
+            queue.put((False, None, sys.exc_info()))
+        finally:
+            queue.put((None, None, None))
+
+    threads = [threading.Thread(target=run, args=(x,)) for x in workers]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    try:
+        pending = {}
+        next_index = 0
+        running = len(threads)
+        while running:
+            ok, i, result = queue.get()
+            if ok is None:
+                running -= 1
+            elif not ok:
+                raise result[0], result[1], result[2]
+            else:
+                pending[i] = result
+                while next_index in pending:
+                    yield pending.pop(next_index)
+                    next_index += 1
+                    slots.release()
+    finally:
+        stop.set()
+        for _ in threads:
+            slots.release()
+        for thread in threads:
+            thread.join()
+
+
+class LazyModule(object):
+    """Module imported on first attribute access.
+
+    The AP SDK is only needed by the device and compile paths, so the CPU
+    engines run on hosts without it; a missing SDK raises ImportError where
+    it is first used. Attributes are cached on the instance after the first
+    lookup.
+    """
+    def __init__(self, name):
+        self.name_ = name
+        self.module_ = None
+
+    def __getattr__(self, attr):
+        if self.module_ is None:
+            self.module_ = __import__(self.name_, fromlist=['*'])
+        value = getattr(self.module_, attr)
+        setattr(self, attr, value)
+        return value
+
 
 # vim: nu:et:ts=4:sw=4:fdm=indent